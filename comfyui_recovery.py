@@ -6,12 +6,16 @@ ComfyUI Recovery System - A tool to rebuild ComfyUI installations
 import os
 import sys
 import logging
+import logging.handlers
+import atexit
+import queue
 import argparse
 from pathlib import Path
-import time
+import threading
+from concurrent.futures import Future
 
 # Import our modules
-from settings import SettingsManager
+from settings import SettingsManager, invalidate_path_cache
 from downloader import Downloader
 from extractor import Extractor
 from symlink_manager import SymlinkManager
@@ -23,21 +27,42 @@ def setup_logging():
     log_dir = os.path.abspath("logs")
     os.makedirs(log_dir, exist_ok=True)
     
-    # Log to file and console
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-    log_file = os.path.join(log_dir, f"recovery_{timestamp}.log")
-    
+    # Log to file and console. Each run starts a fresh recovery.log and the
+    # previous runs are rotated to recovery.log.1 ... recovery.log.5, so repeated
+    # recoveries can't fill the disk.
+    log_file = os.path.join(log_dir, "recovery.log")
+    
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file,
+        maxBytes=10 * 1024 * 1024,
+        backupCount=5,
+        delay=True
+    )
+    if os.path.exists(log_file) and os.path.getsize(log_file) > 0:
+        file_handler.doRollover()
+    console_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+    
+    # Records are queued and written by a background listener thread so that
+    # file and console I/O stay off the caller's critical path
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    # force=True replaces any handler installed before logging was set up;
+    # the queue handler passes the bare message on to the listener's formatter
     logging.basicConfig(
         level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler(sys.stdout)
-        ]
+        format="%(message)s",
+        handlers=[logging.handlers.QueueHandler(log_queue)],
+        force=True
     )
     
-    logging.info(f"ComfyUI Recovery System starting up")
-    logging.info(f"Log file: {log_file}")
+    logging.info("ComfyUI Recovery System starting up")
+    logging.info("Log file: %s", log_file)
 
 def parse_arguments():
     """Parse command-line arguments."""
@@ -71,7 +96,8 @@ def parse_arguments():
     parser.add_argument(
         "--skip-download",
         action="store_true",
-        help="Skip downloading ComfyUI (use existing archive)"
+        help="Skip downloading ComfyUI (use the archive recorded by the last run, "
+             "or comfyui.7z in the install path)"
     )
     
     parser.add_argument(
@@ -92,6 +118,18 @@ def parse_arguments():
         help="Skip installing custom nodes"
     )
     
+    parser.add_argument(
+        "--defender-exclusion",
+        action="store_true",
+        help="Temporarily exclude the install path from Windows Defender while extracting (requires admin)"
+    )
+    
+    parser.add_argument(
+        "--prefetch-wheels",
+        action="store_true",
+        help="Download all custom node requirements first, then install them offline"
+    )
+    
     parser.add_argument(
         "--skip-first-run",
         action="store_true",
@@ -101,11 +139,33 @@ def parse_arguments():
     parser.add_argument(
         "--latest",
         action="store_true",
-        help="Download the latest version from GitHub (bypass cache)"
+        help="Use the latest version from GitHub instead of the configured one"
     )
     
     return parser.parse_args()
 
+def run_in_background(func, *args):
+    """
+    Run a function on a daemon thread so it never delays the program exiting.
+    
+    Args:
+        func: Function to call
+        *args: Arguments to pass to the function
+        
+    Returns:
+        Future: Resolves to the function's return value
+    """
+    future = Future()
+    
+    def run():
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
 def confirm_action(prompt):
     """Ask user for confirmation."""
     response = input(f"{prompt} (y/n): ").strip().lower()
@@ -120,12 +180,23 @@ def main():
     args = parse_arguments()
     
     # Initialize components
-    settings = SettingsManager()
-    downloader = Downloader()
-    extractor = Extractor()
+    settings = SettingsManager.get()
+    downloader = Downloader(settings)
+    extractor = Extractor(defender_exclusion=args.defender_exclusion)
     symlink_manager = SymlinkManager()
     node_installer = NodeInstaller()
     
+    # The 7z archive cannot be extracted while it is still streaming in, so the
+    # only network work that can overlap is the GitHub release lookup and the
+    # connection warm-up. Start them now so they run while settings are
+    # validated and the user is prompted. Daemon threads keep an early exit
+    # (declined prompt, missing settings) from waiting on the network.
+    latest_future = None
+    if not args.skip_download:
+        latest_future = run_in_background(downloader.get_latest_comfyui_version, args.latest)
+        run_in_background(downloader.warm_up, settings.get_setting("comfyui_url"),
+                          latest_future if args.latest else None)
+    
     # Update settings from command line arguments
     if args.install_path:
         settings.update_setting("install_path", args.install_path)
@@ -159,7 +230,7 @@ def main():
         # Validate again
         valid, missing = settings.validate_settings()
         if not valid:
-            logging.error(f"Required settings still missing: {', '.join(missing)}")
+            logging.error("Required settings still missing: %s", ', '.join(missing))
             sys.exit(1)
     
     # Check if install path is empty
@@ -170,6 +241,7 @@ def main():
     
     # Make sure destination path exists
     os.makedirs(install_path, exist_ok=True)
+    invalidate_path_cache()
     
     # Check if the install path is empty
     valid_install, message = settings.validate_install_path()
@@ -179,72 +251,81 @@ def main():
             logging.info("Installation cancelled by user")
             sys.exit(0)
     
-    logging.info(f"Using install path: {install_path}")
-    logging.info(f"Using models path: {models_path}")
-    logging.info(f"Using repository list: {repo_list_path}")
+    logging.info("Using install path: %s", install_path)
+    logging.info("Using models path: %s", models_path)
+    logging.info("Using repository list: %s", repo_list_path)
     
     # Download ComfyUI if needed
-    download_path = os.path.join(install_path, "comfyui.7z")
+    download_path = settings.get_setting("cached_archive_path") or os.path.join(install_path, "comfyui.7z")
     
     if not args.skip_download:
         # Check for latest version from GitHub
-        latest_version, latest_url = downloader.get_latest_comfyui_version()
-        current_version = downloader.extract_version_from_url(comfyui_url)
-        cached_version = settings.get_setting("cached_version", "")
+        latest_version, latest_url = latest_future.result()
+        settings.save_settings()  # persist the refreshed GitHub release cache
         
-        # Determine if we need to download
-        need_download = True
-        
-        # Check if we have a cached archive
-        if downloader.check_cached_archive(download_path) and not args.latest:
-            logging.info(f"Using cached ComfyUI archive (version {cached_version or current_version})")
-            
-            # Check if there's a newer version available
-            if latest_version and latest_version != cached_version and latest_version != current_version:
-                logging.info(f"\n{'='*60}")
-                logging.info(f"NEW VERSION AVAILABLE!")
-                logging.info(f"Current: {cached_version or current_version}")
-                logging.info(f"Latest:  {latest_version}")
-                logging.info(f"Use --latest flag to download the new version")
-                logging.info(f"{'='*60}\n")
-            
-            need_download = False
-        elif args.latest:
+        if args.latest:
             # User wants the latest version
             if latest_version and latest_url:
-                logging.info(f"Downloading latest version: {latest_version}")
+                logging.info("Using latest version: %s", latest_version)
                 comfyui_url = latest_url
                 settings.update_setting("comfyui_url", latest_url)
             else:
                 logging.warning("Could not determine latest version, using configured URL")
         
-        # Download if needed
-        if need_download:
-            logging.info(f"Downloading ComfyUI from {comfyui_url}")
+        # Archives are cached per version so reinstalling to a new path reuses them
+        current_version = downloader.extract_version_from_url(comfyui_url)
+        if current_version:
+            download_path = downloader.get_cached_archive_path(current_version)
+        else:
+            download_path = os.path.join(install_path, "comfyui.7z")
+        
+        # Check if we have a cached archive, taking over one left by an older version
+        archive_ready = downloader.check_cached_archive(download_path)
+        if not archive_ready and settings.get_setting("cached_version", "") in ("", current_version):
+            legacy_paths = (settings.get_setting("cached_archive_path"), os.path.join(install_path, "comfyui.7z"))
+            for legacy_path in legacy_paths:
+                adopted_path = downloader.adopt_legacy_archive(legacy_path, download_path)
+                if adopted_path:
+                    download_path = adopted_path
+                    archive_ready = downloader.check_cached_archive(download_path)
+                    break
+        
+        if archive_ready:
+            logging.info("Using cached ComfyUI archive (version %s)", current_version)
+            
+            # Check if there's a newer version available
+            if latest_version and latest_version != current_version:
+                logging.info("\n" + "="*60)
+                logging.info("NEW VERSION AVAILABLE!")
+                logging.info("Current: %s", current_version)
+                logging.info("Latest:  %s", latest_version)
+                logging.info("Use --latest flag to download the new version")
+                logging.info("="*60 + "\n")
+        else:
+            logging.info("Downloading ComfyUI from %s", comfyui_url)
             success = downloader.download_with_retry(comfyui_url, download_path)
             
             if not success:
                 logging.error("Failed to download ComfyUI")
                 sys.exit(1)
             
-            # Update cached version info
-            downloaded_version = downloader.extract_version_from_url(comfyui_url)
-            if downloaded_version:
-                settings.update_setting("cached_version", downloaded_version)
-                settings.update_setting("cached_archive_path", download_path)
-                settings.save_settings()
-                logging.info(f"Cached version info updated: {downloaded_version}")
-            
-            logging.info(f"Download completed: {download_path}")
+            downloader.write_checksum(download_path)
+            logging.info("Download completed: %s", download_path)
+        
+        # Update cached version info
+        if current_version:
+            settings.update_setting("cached_version", current_version)
+        settings.update_setting("cached_archive_path", download_path)
+        settings.save_settings()
     else:
         logging.info("Skipping download (--skip-download)")
         if not os.path.exists(download_path):
-            logging.error(f"Archive not found: {download_path}")
+            logging.error("Archive not found: %s", download_path)
             sys.exit(1)
     
     # Extract ComfyUI
     if not args.skip_extract:
-        logging.info(f"Extracting ComfyUI to {install_path}")
+        logging.info("Extracting ComfyUI to %s", install_path)
         success = extractor.extract_archive(download_path, install_path)
         
         if not success:
@@ -257,6 +338,11 @@ def main():
             sys.exit(1)
         
         logging.info("Extraction completed successfully")
+        
+        # The layout may differ from one detected before this extraction
+        invalidate_path_cache()
+        symlink_manager.invalidate_base_cache(install_path)
+        node_installer.invalidate_base_cache(install_path)
     else:
         logging.info("Skipping extraction (--skip-extract)")
     
@@ -270,7 +356,7 @@ def main():
         success, message = first_run_init.run_first_initialization(install_path)
         
         if not success:
-            logging.error(f"First-run initialization failed: {message}")
+            logging.error("First-run initialization failed: %s", message)
             logging.warning("Custom nodes may not install correctly without embedded Python")
             if not confirm_action("Continue anyway?"):
                 logging.info("Installation cancelled by user")
@@ -285,10 +371,13 @@ def main():
     # Create symbolic links (after first-run to replace default models directory)
     if not args.skip_symlink:
         logging.info("Setting up model symbolic links")
-        success, message = symlink_manager.setup_model_symlinks(install_path, models_path)
+        success, message = symlink_manager.setup_model_symlinks(
+            settings.get_abs_path("install_path"),
+            settings.get_abs_path("models_path")
+        )
         
         if not success:
-            logging.error(f"Failed to create symbolic links: {message}")
+            logging.error("Failed to create symbolic links: %s", message)
             sys.exit(1)
         
         logging.info(message)
@@ -299,18 +388,20 @@ def main():
     if not args.skip_nodes:
         # Check if repo list exists
         if not os.path.exists(repo_list_path):
-            logging.warning(f"Repository list not found: {repo_list_path}")
+            logging.warning("Repository list not found: %s", repo_list_path)
             if confirm_action("Repository list not found. Skip custom node installation?"):
                 args.skip_nodes = True
             else:
                 logging.error("Cannot proceed without repository list")
                 sys.exit(1)
         else:
-            logging.info(f"Installing custom nodes from {repo_list_path}")
-            success, message = node_installer.install_custom_nodes(install_path, repo_list_path)
+            logging.info("Installing custom nodes from %s", repo_list_path)
+            success, message = node_installer.install_custom_nodes(
+                install_path, repo_list_path, prefetch_wheels=args.prefetch_wheels
+            )
             
             if not success:
-                logging.error(f"Failed to install custom nodes: {message}")
+                logging.error("Failed to install custom nodes: %s", message)
             else:
                 logging.info(message)
     else:
@@ -321,12 +412,12 @@ def main():
     logging.info("\n" + "="*60)
     logging.info("ComfyUI Recovery completed successfully!")
     logging.info("="*60)
-    logging.info(f"ComfyUI is installed at: {install_path}")
-    logging.info(f"Models are linked from: {models_path}")
+    logging.info("ComfyUI is installed at: %s", install_path)
+    logging.info("Models are linked from: %s", models_path)
     logging.info("\nTo run ComfyUI, use:")
-    logging.info(f"{os.path.join(install_path, 'ComfyUI_windows_portable_nvidia', 'ComfyUI_windows_portable', 'run_nvidia_gpu.bat')}")
+    logging.info("%s", os.path.join(install_path, 'ComfyUI_windows_portable_nvidia', 'ComfyUI_windows_portable', 'run_nvidia_gpu.bat'))
     logging.info("\nYou may want to add the Python embedded directory to your PATH:")
-    logging.info(f"{python_embeded_path}")
+    logging.info("%s", python_embeded_path)
     logging.info("="*60)
 
 if __name__ == "__main__":
@@ -1,19 +1,211 @@
 import os
 import logging
-import requests
+import socket
+import shutil
+import subprocess
+import hashlib
+import json
+import httpx
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
-import re
+
+# Default read size for download loops; large chunks keep Python-level iterations low
+CHUNK_SIZE = 1024 * 1024
+
+# Minimum interval between progress bar refreshes, in seconds
+PROGRESS_INTERVAL = 0.1
+
+# Size of the byte ranges a parallel download is split into; completed ranges
+# are recorded so an interrupted download only re-fetches the missing ones
+RANGE_SIZE = 64 * 1024 * 1024
+
+# Smallest file accepted as a complete ComfyUI archive
+MIN_ARCHIVE_SIZE = 100 * 1024 * 1024
+
+class ProgressWriter:
+    """File-like wrapper that reports bytes written to a tqdm progress bar in batches."""
+    
+    def __init__(self, f, progress_bar, lock=None):
+        """
+        Initialize the progress writer.
+        
+        Args:
+            f: Binary file object to write to
+            progress_bar: tqdm progress bar to update
+            lock: Optional lock guarding a progress bar shared between threads
+        """
+        self.f = f
+        self.progress_bar = progress_bar
+        self.lock = lock
+        self.written = 0
+        self.pending = 0
+        self.last_update = time.monotonic()
+    
+    def write(self, data):
+        """Write data and refresh the progress bar at most every PROGRESS_INTERVAL seconds."""
+        n = self.f.write(data)
+        self.written += n
+        self.pending += n
+        
+        now = time.monotonic()
+        if now - self.last_update >= PROGRESS_INTERVAL:
+            self.flush_progress()
+            self.last_update = now
+        return n
+    
+    def flush_progress(self):
+        """Push any bytes not yet reported to the progress bar."""
+        if not self.pending:
+            return
+        if self.lock:
+            with self.lock:
+                self.progress_bar.update(self.pending)
+        else:
+            self.progress_bar.update(self.pending)
+        self.pending = 0
+
 
 class Downloader:
     """Handles downloading files with progress tracking and resume capability."""
     
-    def __init__(self):
-        """Initialize the downloader."""
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'ComfyUI-Recovery/1.0'
-        })
+    GITHUB_LATEST_URL = "https://api.github.com/repos/comfyanonymous/ComfyUI/releases/latest"
+    
+    # Minimum time a cached latest-release lookup is reused without a request, in seconds
+    LATEST_VERSION_TTL = 600
+    
+    def __init__(self, settings=None):
+        """
+        Initialize the downloader.
+        
+        Args:
+            settings: Optional SettingsManager used to cache GitHub release lookups
+        """
+        self.settings = settings
+        # HTTP/2 multiplexes the small API requests over one connection, and
+        # keepalive stops idle pooled connections being dropped between steps
+        self.session = self.create_client()
+    
+    def create_client(self, http2=True, max_connections=100):
+        """
+        Create an HTTP client with the downloader's connection tuning applied.
+        
+        An explicit transport disables httpx's environment proxy support, so the
+        HTTP(S)_PROXY/ALL_PROXY/NO_PROXY routes are mounted on the client as well.
+        
+        Args:
+            http2: Whether to negotiate HTTP/2
+            max_connections: Size of the connection pool
+            
+        Returns:
+            httpx.Client: The configured client
+        """
+        return httpx.Client(
+            transport=self.build_transport(http2=http2, max_connections=max_connections),
+            mounts=self.get_proxy_mounts(http2=http2, max_connections=max_connections),
+            follow_redirects=True,
+            headers={'User-Agent': 'ComfyUI-Recovery/1.0'}
+        )
+    
+    def build_transport(self, proxy=None, http2=True, max_connections=100):
+        """
+        Build a connection pool transport with the downloader's tuning applied.
+        
+        Args:
+            proxy: Optional proxy URL the transport connects through
+            http2: Whether to negotiate HTTP/2
+            max_connections: Size of the connection pool
+            
+        Returns:
+            httpx.HTTPTransport: The configured transport
+        """
+        return httpx.HTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=min(max_connections, 20),
+                keepalive_expiry=60
+            ),
+            socket_options=self.get_socket_options(),
+            proxy=proxy
+        )
+    
+    def get_proxy_mounts(self, http2=True, max_connections=100):
+        """
+        Get transports for the proxies configured in the environment.
+        
+        Args:
+            http2: Whether the proxied transports negotiate HTTP/2
+            max_connections: Size of each proxied connection pool
+            
+        Returns:
+            dict: URL pattern -> proxied transport, or None for NO_PROXY hosts
+                  (which then use the client's default transport)
+        """
+        try:
+            from httpx._utils import get_environment_proxies
+            proxies = get_environment_proxies()
+        except ImportError:
+            # Without httpx's parser, fall back to the standard library's lookup
+            import urllib.request
+            proxies = {
+                f"{scheme}://": url
+                for scheme, url in urllib.request.getproxies().items()
+                if scheme in ('http', 'https', 'all')
+            }
+        
+        return {
+            pattern: self.build_transport(url, http2, max_connections) if url else None
+            for pattern, url in proxies.items()
+        }
+    
+    def get_socket_options(self):
+        """
+        Get the socket options applied to every connection in the pool.
+        
+        Returns:
+            list: (level, option, value) tuples supported on this platform
+        """
+        options = [
+            (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        
+        # Keepalive tuning constants are not available on every platform
+        for name, value in (('TCP_KEEPIDLE', 60), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 5)):
+            if hasattr(socket, name):
+                options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+        
+        return options
+    
+    def warm_up(self, url, latest_future=None):
+        """
+        Open pooled connections to a download host ahead of time.
+        
+        A HEAD request follows any redirects, so the DNS, TCP and TLS setup for
+        both the origin and its CDN is paid before the download starts. Nothing
+        is done if the archive for the URL is already cached.
+        
+        Args:
+            url: URL that will be downloaded later
+            latest_future: Optional future of get_latest_comfyui_version; its
+                           URL is warmed up instead once the lookup finishes
+        """
+        if latest_future is not None:
+            latest_url = latest_future.result()[1]
+            url = latest_url or url
+        
+        version = self.extract_version_from_url(url)
+        if version:
+            archive_path = self.get_cached_archive_path(version)
+            if os.path.exists(archive_path) and os.path.exists(archive_path + '.sha256'):
+                return
+        
+        try:
+            self.session.head(url, timeout=10)
+        except httpx.HTTPError as e:
+            logging.debug("Connection warm-up failed for %s: %s", url, e)
     
     def extract_version_from_url(self, url):
         """
@@ -25,45 +217,178 @@ class Downloader:
         Returns:
             str: Version string (e.g., 'v0.3.27') or None
         """
-        match = re.search(r'/v(\d+\.\d+\.\d+)/', url)
-        if match:
-            return f"v{match.group(1)}"
+        # Look for a "/vX.Y.Z/" path segment without going through the regex engine
+        for segment in url.split('/')[1:-1]:
+            if segment.startswith('v'):
+                parts = segment[1:].split('.')
+                if len(parts) == 3 and all(part.isdigit() for part in parts):
+                    return segment
         return None
     
-    def get_latest_comfyui_version(self):
+    def get_max_age(self, cache_control):
+        """
+        Parse the max-age directive from a Cache-Control header.
+        
+        Args:
+            cache_control: Cache-Control header value
+            
+        Returns:
+            int: max-age in seconds, or 0 if not present
+        """
+        for directive in cache_control.split(','):
+            name, _, value = directive.strip().partition('=')
+            if name.lower() == 'max-age' and value.isdigit():
+                return int(value)
+        return 0
+    
+    def get_latest_comfyui_version(self, force_refresh=False):
         """
         Get the latest ComfyUI release version from GitHub.
         
+        When a SettingsManager was supplied, the last response is cached in the
+        ``github_latest_cache`` setting. The cached result is returned without a
+        request for LATEST_VERSION_TTL seconds (or the response's Cache-Control
+        max-age, if longer), and is otherwise revalidated with an ETag
+        conditional GET. The caller is responsible for saving the settings.
+        
+        Args:
+            force_refresh: Always revalidate with GitHub, ignoring the TTL
+            
         Returns:
             tuple: (version_string, download_url) or (None, None) on error
         """
+        cache = {}
+        if self.settings:
+            cache = self.settings.get_setting("github_latest_cache") or {}
+        
         try:
-            api_url = "https://api.github.com/repos/comfyanonymous/ComfyUI/releases/latest"
-            response = self.session.get(api_url, timeout=10)
+            # Skip the request entirely while the cached response is still fresh
+            max_age = max(cache.get('max_age', 0), self.LATEST_VERSION_TTL)
+            if not force_refresh and cache.get('version') and time.time() - cache.get('fetched_at', 0) < max_age:
+                logging.info("Using cached latest version info: %s", cache['version'])
+                return cache['version'], cache.get('url')
+            
+            headers = {}
+            if cache.get('etag'):
+                headers['If-None-Match'] = cache['etag']
+            
+            response = self.session.get(self.GITHUB_LATEST_URL, headers=headers, timeout=10)
+            
+            if response.status_code == 304 and cache.get('version'):
+                # Release unchanged since the last lookup; store a new dict rather
+                # than mutating the one the settings own from this thread
+                if self.settings:
+                    self.settings.update_setting("github_latest_cache", dict(
+                        cache,
+                        fetched_at=time.time(),
+                        max_age=self.get_max_age(response.headers.get('cache-control', ''))
+                    ))
+                return cache['version'], cache.get('url')
             
             if response.status_code == 200:
                 data = response.json()
                 version = data.get('tag_name', '')
+                download_url = None
                 
                 # Find the Windows portable NVIDIA asset
                 for asset in data.get('assets', []):
                     if 'ComfyUI_windows_portable_nvidia.7z' in asset.get('name', ''):
-                        return version, asset.get('browser_download_url')
+                        download_url = asset.get('browser_download_url')
+                        break
+                else:
+                    logging.warning("Latest release found but no Windows portable NVIDIA asset")
+                
+                if self.settings:
+                    self.settings.update_setting("github_latest_cache", {
+                        "etag": response.headers.get('etag', ''),
+                        "version": version,
+                        "url": download_url,
+                        "fetched_at": time.time(),
+                        "max_age": self.get_max_age(response.headers.get('cache-control', ''))
+                    })
                 
-                logging.warning("Latest release found but no Windows portable NVIDIA asset")
-                return version, None
+                return version, download_url
             else:
-                logging.warning(f"Failed to get latest version from GitHub: {response.status_code}")
+                logging.warning("Failed to get latest version from GitHub: %s", response.status_code)
                 return None, None
                 
         except Exception as e:
-            logging.warning(f"Error checking for latest version: {e}")
+            logging.warning("Error checking for latest version: %s", e)
             return None, None
     
+    def get_cache_dir(self):
+        """
+        Get the per-user directory where downloaded archives are cached.
+        
+        Returns:
+            str: Path to the archive cache directory
+        """
+        if os.name == 'nt':  # Windows
+            base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+        else:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+        return os.path.join(base, 'comfyui-recovery', 'archives')
+    
+    def get_cached_archive_path(self, version):
+        """
+        Get the cache path for the archive of a given ComfyUI version.
+        
+        Args:
+            version: Version string (e.g., 'v0.3.27')
+            
+        Returns:
+            str: Path to the cached archive
+        """
+        return os.path.join(self.get_cache_dir(), f"{version}.7z")
+    
+    def compute_sha256(self, path):
+        """
+        Compute the SHA256 digest of a file.
+        
+        Args:
+            path: Path to the file
+            
+        Returns:
+            str: Hex digest
+        """
+        with open(path, 'rb') as f:
+            # Python 3.11+ hashes the file in C with a reusable buffer
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, 'sha256').hexdigest()
+            
+            sha256 = hashlib.sha256()
+            buffer = bytearray(CHUNK_SIZE)
+            view = memoryview(buffer)
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                sha256.update(view[:n])
+            return sha256.hexdigest()
+    
+    def write_checksum(self, archive_path):
+        """
+        Write a ``.sha256`` sidecar file next to a downloaded archive.
+        
+        Args:
+            archive_path: Path to the archive
+            
+        Returns:
+            str: Hex digest that was written
+        """
+        digest = self.compute_sha256(archive_path)
+        with open(archive_path + '.sha256', 'w') as f:
+            f.write(f"{digest} *{os.path.basename(archive_path)}\n")
+        logging.info("Archive checksum written: %s", digest)
+        return digest
+    
     def check_cached_archive(self, archive_path):
         """
         Check if a cached archive exists and is valid.
         
+        The archive must have a ``.sha256`` sidecar. The digest is only
+        recomputed when the archive was modified after the sidecar was written.
+        
         Args:
             archive_path: Path to the cached archive
             
@@ -75,14 +400,138 @@ class Downloader:
         
         # Check if file has reasonable size (at least 100MB)
         file_size = os.path.getsize(archive_path)
-        if file_size < 100 * 1024 * 1024:  # 100MB minimum
-            logging.warning(f"Cached archive appears incomplete: {file_size} bytes")
+        if file_size < MIN_ARCHIVE_SIZE:
+            logging.warning("Cached archive appears incomplete: %s bytes", file_size)
+            return False
+        
+        checksum_path = archive_path + '.sha256'
+        if not os.path.exists(checksum_path):
+            logging.warning("Cached archive has no checksum, it may be incomplete: %s", archive_path)
             return False
         
-        logging.info(f"Found cached archive: {archive_path} ({file_size / (1024**3):.2f} GB)")
+        if os.path.getmtime(archive_path) > os.path.getmtime(checksum_path):
+            logging.info("Cached archive changed since it was downloaded, verifying checksum...")
+            with open(checksum_path, 'r') as f:
+                expected = f.read().split(' ', 1)[0].strip()
+            actual = self.compute_sha256(archive_path)
+            if actual != expected:
+                logging.warning("Cached archive checksum mismatch: expected %s, got %s", expected, actual)
+                return False
+            # Refresh the sidecar so the next run can skip hashing again
+            os.utime(checksum_path)
+        
+        logging.info("Found cached archive: %s (%.2f GB)", archive_path, file_size / (1024**3))
         return True
     
-    def download_file(self, url, destination, chunk_size=8192):
+    def adopt_legacy_archive(self, legacy_path, archive_path):
+        """
+        Move an archive downloaded by an older version into the archive cache.
+        
+        Older versions saved the archive as ``comfyui.7z`` in the install path
+        without a checksum. The archive is moved to the versioned cache path (or
+        used in place if it lives on another drive) and hashed once, so it is
+        not downloaded again.
+        
+        Args:
+            legacy_path: Path of the archive from an older version
+            archive_path: Versioned cache path the archive belongs at
+            
+        Returns:
+            str: Path of the adopted archive, or None if there was none to adopt
+        """
+        if not legacy_path or os.path.abspath(legacy_path) == os.path.abspath(archive_path):
+            return None
+        if not os.path.isfile(legacy_path) or os.path.getsize(legacy_path) < MIN_ARCHIVE_SIZE:
+            return None
+        
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+            os.replace(legacy_path, archive_path)
+            if os.path.exists(legacy_path + '.sha256'):
+                os.replace(legacy_path + '.sha256', archive_path + '.sha256')
+            logging.info("Moved existing archive %s to the archive cache: %s", legacy_path, archive_path)
+        except OSError as e:
+            # Moving across drives would mean copying several GB, so use it where it is
+            logging.info("Using existing archive in place (%s): %s", e, legacy_path)
+            archive_path = legacy_path
+        
+        if not os.path.exists(archive_path + '.sha256'):
+            logging.info("Computing checksum of existing archive...")
+            self.write_checksum(archive_path)
+        return archive_path
+    
+    def copy_response(self, response, writer, chunk_size=CHUNK_SIZE):
+        """
+        Copy a streamed response body into a ProgressWriter.
+        
+        Bodies without a Content-Encoding (such as the 7z archive) are read
+        with ``iter_raw`` so httpx skips its decoder layer entirely.
+        
+        Args:
+            response: Open streaming response
+            writer: ProgressWriter wrapping the destination file
+            chunk_size: Size of chunks to download at a time
+        """
+        encoding = response.headers.get('content-encoding', 'identity').lower()
+        if encoding == 'identity':
+            chunks = response.iter_raw(chunk_size=chunk_size)
+        else:
+            chunks = response.iter_bytes(chunk_size=chunk_size)
+        
+        for chunk in chunks:
+            if chunk:  # filter out keep-alive new chunks
+                writer.write(chunk)
+        
+        writer.flush_progress()
+    
+    def _write_response(self, response, destination, file_size, chunk_size):
+        """
+        Write a streamed response body to disk with progress tracking.
+        
+        Args:
+            response: Open streaming response
+            destination: Path where the file should be saved
+            file_size: Number of bytes already on disk (0 for a fresh download)
+            chunk_size: Size of chunks to download at a time
+            
+        Returns:
+            bool: True if the file is complete, False otherwise
+        """
+        # Get total file size
+        total_size = int(response.headers.get('content-length', 0))
+        
+        # If we're resuming, adjust total size
+        if response.status_code == 206:  # Partial content
+            total_size += file_size
+        
+        # Set up progress bar
+        desc = os.path.basename(destination)
+        progress_bar = tqdm(
+            total=total_size,
+            initial=file_size,
+            unit='B',
+            unit_scale=True,
+            desc=desc
+        )
+        
+        # Open file for writing (append if resuming, write if new)
+        mode = 'ab' if file_size > 0 else 'wb'
+        with open(destination, mode) as f:
+            writer = ProgressWriter(f, progress_bar)
+            self.copy_response(response, writer, chunk_size)
+        
+        progress_bar.close()
+        
+        # Check if download was complete, using the bytes we wrote rather than another stat
+        downloaded = file_size + writer.written
+        if downloaded >= total_size:
+            logging.info("Download complete: %s", destination)
+            return True
+        else:
+            logging.error("Download incomplete. Expected %s bytes, got %s", total_size, downloaded)
+            return False
+    
+    def download_file(self, url, destination, chunk_size=CHUNK_SIZE):
         """
         Download a file from URL to destination with progress tracking and resume capability.
         
@@ -106,62 +555,304 @@ class Downloader:
             if os.path.exists(destination):
                 file_size = os.path.getsize(destination)
                 resume_header = {'Range': f'bytes={file_size}-'}
-                logging.info(f"Resuming download from byte {file_size}")
+                logging.info("Resuming download from byte %s", file_size)
             
             # Make initial request to get file size and check if resume is accepted
-            response = self.session.get(url, stream=True, headers=resume_header, timeout=10)
-            
-            # Handle redirect if necessary
-            if response.history:
-                logging.info(f"Request was redirected to {response.url}")
-                url = response.url
-            
-            # Get total file size
-            total_size = int(response.headers.get('content-length', 0))
-            
-            # If we're resuming, adjust total size
-            if response.status_code == 206:  # Partial content
-                total_size += file_size
-            elif file_size > 0:  # Server doesn't support resume, start over
-                logging.warning("Server doesn't support resuming, restarting download")
-                file_size = 0
-                os.remove(destination)
-                response = self.session.get(url, stream=True, timeout=10)
-            
-            # Set up progress bar
-            desc = os.path.basename(destination)
+            with self.session.stream("GET", url, headers=resume_header, timeout=10) as response:
+                # Handle redirect if necessary
+                if response.history:
+                    logging.info("Request was redirected to %s", response.url)
+                    url = str(response.url)
+                
+                if response.status_code != 206 and file_size > 0:
+                    # Server doesn't support resume, start over
+                    logging.warning("Server doesn't support resuming, restarting download")
+                    file_size = 0
+                    os.remove(destination)
+                else:
+                    # Never save an error page as the archive
+                    response.raise_for_status()
+                    return self._write_response(response, destination, file_size, chunk_size)
+            
+            with self.session.stream("GET", url, timeout=10) as response:
+                response.raise_for_status()
+                return self._write_response(response, destination, file_size, chunk_size)
+                
+        except httpx.HTTPError as e:
+            logging.error("Download error: %s", e)
+            return False
+        except Exception as e:
+            logging.error("Unexpected error during download: %s", e)
+            return False
+    
+    def preallocate_file(self, path, size):
+        """
+        Create a file and reserve disk space for its full size up front.
+        
+        Reserving the extents before writing avoids repeated allocations and
+        fragmentation while a multi-GB archive is written.
+        
+        Args:
+            path: Path of the file to create (truncated if it exists)
+            size: Size in bytes to allocate
+        """
+        with open(path, 'wb') as f:
+            if size and hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                    return
+                except OSError as e:
+                    # Some filesystems don't support fallocate
+                    logging.debug("posix_fallocate not supported, falling back to truncate: %s", e)
+            
+            # On Windows, extending with SetEndOfFile allocates the clusters
+            f.truncate(size)
+    
+    def probe_range_support(self, url):
+        """
+        Check whether the server honours HTTP range requests for a URL.
+        
+        Args:
+            url: URL to probe
+            
+        Returns:
+            tuple: (final_url, total_size) if ranges are supported, (None, 0) otherwise
+        """
+        with self.session.stream("GET", url, headers={'Range': 'bytes=0-0'}, timeout=10) as response:
+            if response.status_code != 206:
+                return None, 0
+            
+            # Content-Range looks like "bytes 0-0/123456"
+            content_range = response.headers.get('content-range', '')
+            total = content_range.rpartition('/')[2]
+            if not total.isdigit():
+                return None, 0
+            
+            return str(response.url), int(total)
+    
+    def _download_range(self, client, url, part_path, start, end, progress_bar, lock, chunk_size):
+        """
+        Download a single byte range into its slice of the destination file.
+        
+        Args:
+            client: HTTP client to make the request with
+            url: URL to download from
+            part_path: Path of the preallocated file being written
+            start: First byte of the range (inclusive)
+            end: Last byte of the range (inclusive)
+            progress_bar: Shared tqdm progress bar
+            lock: Lock guarding progress bar updates
+            chunk_size: Size of chunks to download at a time
+        """
+        headers = {'Range': f'bytes={start}-{end}'}
+        with client.stream("GET", url, headers=headers, timeout=10) as response:
+            if response.status_code != 206:
+                raise IOError(f"Range request bytes={start}-{end} returned {response.status_code}")
+            
+            with open(part_path, 'r+b') as f:
+                f.seek(start)
+                writer = ProgressWriter(f, progress_bar, lock)
+                self.copy_response(response, writer, chunk_size)
+        
+        expected = end - start + 1
+        written = writer.written
+        if written != expected:
+            raise IOError(f"Range bytes={start}-{end} incomplete: got {written} of {expected} bytes")
+    
+    def load_range_state(self, state_path, url, total_size):
+        """
+        Read which ranges of an interrupted parallel download were completed.
+        
+        Args:
+            state_path: Path of the state file next to the ``.part`` file
+            url: URL being downloaded
+            total_size: Size of the file being downloaded
+            
+        Returns:
+            set: Start offsets of completed ranges (empty if the state doesn't match)
+        """
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        
+        if (not isinstance(state, dict) or state.get('url') != url
+                or state.get('size') != total_size or state.get('range_size') != RANGE_SIZE):
+            return set()
+        return set(state.get('done', []))
+    
+    def save_range_state(self, state_path, url, total_size, done):
+        """
+        Record the completed ranges of a parallel download.
+        
+        Args:
+            state_path: Path of the state file next to the ``.part`` file
+            url: URL being downloaded
+            total_size: Size of the file being downloaded
+            done: Start offsets of completed ranges
+        """
+        state = {'url': url, 'size': total_size, 'range_size': RANGE_SIZE, 'done': sorted(done)}
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+    
+    def download_file_parallel(self, url, destination, num_connections=8, chunk_size=CHUNK_SIZE):
+        """
+        Download a file over several concurrent HTTP range requests.
+        
+        The file is split into RANGE_SIZE ranges which are fetched in parallel
+        into a preallocated ``.part`` file that is renamed into place once every
+        range has completed. Completed ranges are recorded in a ``.part.state``
+        file, so a failed or interrupted download resumes by fetching only the
+        missing ranges. Falls back to the single-stream ``download_file`` if the
+        server does not support range requests.
+        
+        Args:
+            url: URL to download from
+            destination: Path where the file should be saved
+            num_connections: Number of concurrent connections to use
+            chunk_size: Size of chunks to download at a time
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        part_path = destination + '.part'
+        state_path = part_path + '.state'
+        try:
+            if num_connections < 2:
+                logging.info("Using single-stream download (%s connection)", num_connections)
+                return self.download_file(url, destination, chunk_size)
+            
+            final_url, total_size = self.probe_range_support(url)
+            if not final_url:
+                logging.info("Server does not support range requests, using single-stream download")
+                return self.download_file(url, destination, chunk_size)
+            
+            if final_url != url:
+                logging.info("Request was redirected to %s", final_url)
+            
+            os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+            
+            # Resume into the existing .part file if it belongs to this download
+            done = set()
+            if os.path.exists(part_path) and os.path.getsize(part_path) == total_size:
+                done = self.load_range_state(state_path, url, total_size)
+            if done:
+                logging.info("Resuming download: %s of %s ranges already complete",
+                             len(done), -(-total_size // RANGE_SIZE))
+            else:
+                # Preallocate the file so each worker can write into its own slice
+                self.preallocate_file(part_path, total_size)
+                self.save_range_state(state_path, url, total_size, done)
+            
+            ranges = [(start, min(start + RANGE_SIZE, total_size) - 1)
+                      for start in range(0, total_size, RANGE_SIZE)
+                      if start not in done]
+            
+            logging.info("Downloading %s bytes using %s connections", total_size, min(num_connections, len(ranges)))
+            
             progress_bar = tqdm(
                 total=total_size,
-                initial=file_size,
+                initial=total_size - sum(end - start + 1 for start, end in ranges),
                 unit='B',
                 unit_scale=True,
-                desc=desc
+                desc=os.path.basename(destination)
             )
+            lock = threading.Lock()
             
-            # Open file for writing (append if resuming, write if new)
-            mode = 'ab' if file_size > 0 else 'wb'
-            with open(destination, mode) as f:
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    if chunk:  # filter out keep-alive new chunks
-                        f.write(chunk)
-                        progress_bar.update(len(chunk))
+            # Each range gets its own HTTP/1.1 connection, since HTTP/2 would
+            # multiplex them all over a single TCP stream. Ranges request the
+            # original URL so expiring signed redirect targets are re-resolved.
+            try:
+                with self.create_client(http2=False, max_connections=num_connections) as client, \
+                        ThreadPoolExecutor(max_workers=max(1, min(num_connections, len(ranges)))) as executor:
+                    futures = {
+                        executor.submit(self._download_range, client, url, part_path,
+                                        start, end, progress_bar, lock, chunk_size): start
+                        for start, end in ranges
+                    }
+                    # Record every range that completes, even after another one failed
+                    error = None
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            error = error or e
+                            continue
+                        done.add(futures[future])
+                        self.save_range_state(state_path, url, total_size, done)
+            finally:
+                progress_bar.close()
             
-            progress_bar.close()
+            if error:
+                raise error
             
-            # Check if download was complete
-            if os.path.getsize(destination) >= total_size:
-                logging.info(f"Download complete: {destination}")
-                return True
-            else:
-                logging.error(f"Download incomplete. Expected {total_size} bytes, got {os.path.getsize(destination)}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Download error: {e}")
-            return False
+            os.replace(part_path, destination)
+            os.remove(state_path)
+            logging.info("Download complete: %s", destination)
+            return True
+            
+        except httpx.HTTPError as e:
+            logging.error("Download error: %s", e)
         except Exception as e:
-            logging.error(f"Unexpected error during download: {e}")
+            logging.error("Unexpected error during parallel download: %s", e)
+        
+        # The .part file and its state are kept so the next attempt resumes
+        if os.path.exists(part_path):
+            logging.info("Partial download kept for resuming: %s", part_path)
+        return False
+    
+    def download_with_aria2(self, url, destination, num_connections=16):
+        """
+        Download a file with the aria2c command-line downloader, if installed.
+        
+        aria2c splits the transfer across parallel range requests with a native
+        I/O loop and resumes interrupted downloads from its control file.
+        
+        Args:
+            url: URL to download from
+            destination: Path where the file should be saved
+            num_connections: Number of connections aria2c may open
+            
+        Returns:
+            bool: True if successful, False if aria2c is unavailable or failed
+        """
+        aria2c = shutil.which('aria2c')
+        if not aria2c:
+            return False
+        
+        destination = os.path.abspath(destination)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        
+        cmd = [
+            aria2c,
+            '-x', str(num_connections),
+            '-s', str(num_connections),
+            '-k', '1M',
+            '--continue=true',
+            '--allow-overwrite=true',
+            '--console-log-level=warn',
+            '-d', os.path.dirname(destination),
+            '-o', os.path.basename(destination),
+            url
+        ]
+        
+        logging.info("Downloading with aria2c: %s", ' '.join(cmd))
+        
+        try:
+            result = subprocess.run(cmd)
+        except OSError as e:
+            logging.warning("Could not run aria2c: %s", e)
+            return False
+        
+        if result.returncode != 0:
+            logging.warning("aria2c exited with code %s, falling back to built-in downloader", result.returncode)
             return False
+        
+        logging.info("Download complete: %s", destination)
+        return True
     
     def download_with_retry(self, url, destination, max_retries=3, retry_delay=5):
         """
@@ -177,14 +868,17 @@ class Downloader:
             bool: True if successful, False otherwise
         """
         for attempt in range(max_retries):
-            logging.info(f"Download attempt {attempt + 1}/{max_retries}: {url}")
-            if self.download_file(url, destination):
+            logging.info("Download attempt %s/%s: %s", attempt + 1, max_retries, url)
+            if self.download_with_aria2(url, destination):
+                return True
+            
+            if self.download_file_parallel(url, destination):
                 return True
             
             if attempt < max_retries - 1:
-                logging.info(f"Retrying in {retry_delay} seconds...")
+                logging.info("Retrying in %s seconds...", retry_delay)
                 time.sleep(retry_delay)
                 retry_delay *= 2  # Exponential backoff
         
-        logging.error(f"Failed to download {url} after {max_retries} attempts")
+        logging.error("Failed to download %s after %s attempts", url, max_retries)
         return False
@@ -1,17 +1,38 @@
 import os
+import json
+import asyncio
 import logging
 import subprocess
 import shutil
 import tempfile
+import tarfile
 import sys
 import py7zr
 
+# Block size py7zr uses when reading and decompressing archive data
+PY7ZR_BLOCKSIZE = 1024 * 1024
+
+# Written to the extraction directory once an extraction has completed
+SENTINEL_FILENAME = ".recovery_complete"
+
 class Extractor:
     """Handles extraction of 7z archives."""
     
-    def __init__(self):
-        """Initialize the extractor."""
-        pass
+    def __init__(self, threads=None, defender_exclusion=False):
+        """
+        Initialize the extractor.
+        
+        Args:
+            threads: Number of decoder threads for the 7z binary (default: one per core)
+            defender_exclusion: Temporarily exclude the extraction directory from
+                                Windows Defender while extracting (requires admin)
+        """
+        self.threads = threads or os.cpu_count() or 1
+        self.defender_exclusion = defender_exclusion
+        
+        # Result of the 7-Zip executable lookup, filled in on first use
+        self._seven_zip_path = None
+        self._seven_zip_searched = False
     
     def extract_7z_py7zr(self, archive_path, extract_path):
         """
@@ -27,7 +48,13 @@ class Extractor:
         try:
             os.makedirs(extract_path, exist_ok=True)
             
-            with py7zr.SevenZipFile(archive_path, mode='r') as archive:
+            # Read and decode in 1 MiB blocks instead of py7zr's small default.
+            # py7zr already decodes each folder of a non-solid archive on its own
+            # thread. mp=True swaps those threads for processes, but its child
+            # processes report errors through a thread-only queue (so failures
+            # would go unnoticed) and are not bounded by self.threads, so it is
+            # left off.
+            with py7zr.SevenZipFile(archive_path, mode='r', blocksize=PY7ZR_BLOCKSIZE) as archive:
                 logging.info(f"Extracting {archive_path} to {extract_path}")
                 archive.extractall(path=extract_path)
             
@@ -37,6 +64,206 @@ class Extractor:
             logging.error(f"Error extracting archive with py7zr: {e}")
             return False
     
+    def extract_tar_zst(self, archive_path, extract_path):
+        """
+        Extract a zstd-compressed tar archive using the zstandard library.
+        
+        zstd decodes several times faster than LZMA2, and the tar stream is
+        extracted as it is decompressed without buffering the whole archive.
+        
+        Args:
+            archive_path: Path to the .tar.zst archive
+            extract_path: Path where to extract the contents
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            import zstandard
+        except ImportError:
+            logging.error("zstandard is required to extract .tar.zst archives (pip install zstandard)")
+            return False
+        
+        try:
+            os.makedirs(extract_path, exist_ok=True)
+            
+            logging.info(f"Extracting {archive_path} to {extract_path}")
+            with open(archive_path, 'rb') as f:
+                reader = zstandard.ZstdDecompressor().stream_reader(f)
+                with tarfile.open(fileobj=reader, mode='r|') as archive:
+                    # Use the safe 'data' filter where this Python supports it
+                    if hasattr(tarfile, 'data_filter'):
+                        archive.extractall(path=extract_path, filter='data')
+                    else:
+                        archive.extractall(path=extract_path)
+            
+            logging.info(f"Extraction completed successfully")
+            return True
+        except Exception as e:
+            logging.error(f"Error extracting archive with zstandard: {e}")
+            return False
+    
+    def build_7z_command(self, seven_zip_path, archive_path, extract_path):
+        """
+        Build the 7z command line used to extract an archive.
+        
+        Args:
+            seven_zip_path: Path to the 7-Zip executable
+            archive_path: Path to the 7z archive
+            extract_path: Path where to extract the contents
+            
+        Returns:
+            list: Command and arguments
+        """
+        # -mmt sets the number of LZMA2 decoder threads. -bso0/-bsp0 silence the
+        # per-file listing and progress output so nothing has to be piped back;
+        # errors still go to stderr.
+        return [seven_zip_path, 'x', archive_path, f'-o{extract_path}', f'-mmt={self.threads}', '-y', '-bso0', '-bsp0']
+    
+    def get_7z_process_kwargs(self):
+        """
+        Get platform-specific keyword arguments for starting the 7z process.
+        
+        Returns:
+            dict: Extra keyword arguments for subprocess/asyncio process creation
+        """
+        # Don't allocate a console for 7z on Windows; its output is discarded anyway
+        if os.name == 'nt':  # Windows
+            return {'creationflags': subprocess.CREATE_NO_WINDOW}
+        return {}
+    
+    def is_admin(self):
+        """
+        Check if the script is running with administrator privileges on Windows.
+        
+        Returns:
+            bool: True if running as admin, False otherwise
+        """
+        try:
+            import ctypes
+            return ctypes.windll.shell32.IsUserAnAdmin() != 0
+        except Exception:
+            return False
+    
+    def run_defender_command(self, cmdlet, extract_path):
+        """
+        Run a Windows Defender preference cmdlet for the extraction directory.
+        
+        Args:
+            cmdlet: Add-MpPreference or Remove-MpPreference
+            extract_path: Path to add to or remove from the exclusion list
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        quoted_path = os.path.abspath(extract_path).replace("'", "''")
+        cmd = [
+            "powershell", "-NoProfile", "-NonInteractive", "-Command",
+            f"{cmdlet} -ExclusionPath '{quoted_path}'"
+        ]
+        try:
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                **self.get_7z_process_kwargs()
+            )
+        except OSError as e:
+            logging.warning(f"Could not run {cmdlet}: {str(e)}")
+            return False
+        
+        if result.returncode != 0:
+            logging.warning(f"{cmdlet} failed: {result.stderr.strip()}")
+            return False
+        return True
+    
+    def has_defender_exclusion(self, extract_path):
+        """
+        Check whether the extraction directory is already excluded from Windows Defender.
+        
+        Args:
+            extract_path: Path where the archive will be extracted
+            
+        Returns:
+            bool: True if excluded, False if not, None if it could not be checked
+        """
+        quoted_path = os.path.abspath(extract_path).replace("'", "''")
+        cmd = [
+            "powershell", "-NoProfile", "-NonInteractive", "-Command",
+            f"(Get-MpPreference).ExclusionPath -contains '{quoted_path}'"
+        ]
+        try:
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                **self.get_7z_process_kwargs()
+            )
+        except OSError as e:
+            logging.warning(f"Could not run Get-MpPreference: {str(e)}")
+            return None
+        
+        output = result.stdout.strip()
+        if result.returncode != 0 or output not in ("True", "False"):
+            logging.warning(f"Get-MpPreference failed: {result.stderr.strip()}")
+            return None
+        return output == "True"
+    
+    def add_defender_exclusion(self, extract_path):
+        """
+        Exclude the extraction directory from Windows Defender scanning.
+        
+        Only done when enabled with defender_exclusion and running as
+        administrator; otherwise a hint is logged. An exclusion the user already
+        had is left alone and never removed afterwards.
+        
+        Args:
+            extract_path: Path where the archive will be extracted
+            
+        Returns:
+            bool: True if an exclusion was added and must be removed afterwards
+        """
+        if os.name != 'nt':
+            return False
+        
+        if not self.defender_exclusion:
+            logging.info(
+                f"Tip: extraction is much faster if {extract_path} is excluded from "
+                "Windows Defender real-time scanning (see --defender-exclusion)"
+            )
+            return False
+        
+        if not self.is_admin():
+            logging.warning("Windows Defender exclusion requires running as administrator, skipping it")
+            return False
+        
+        excluded = self.has_defender_exclusion(extract_path)
+        if excluded is None:
+            # Without knowing the current exclusions we can't tell which ones to remove later
+            logging.warning("Could not read Windows Defender exclusions, skipping the temporary exclusion")
+            return False
+        if excluded:
+            logging.info(f"{extract_path} is already excluded from Windows Defender scanning")
+            return False
+        
+        if self.run_defender_command("Add-MpPreference", extract_path):
+            logging.info(f"Temporarily excluded {extract_path} from Windows Defender scanning")
+            return True
+        return False
+    
+    def remove_defender_exclusion(self, extract_path):
+        """
+        Remove the exclusion added by add_defender_exclusion.
+        
+        Args:
+            extract_path: Path where the archive was extracted
+        """
+        if self.run_defender_command("Remove-MpPreference", extract_path):
+            logging.info(f"Removed Windows Defender exclusion for {extract_path}")
+        else:
+            logging.warning(f"Please remove the Windows Defender exclusion for {extract_path} manually")
+    
     def extract_7z_binary(self, archive_path, extract_path):
         """
         Extract a 7z archive using 7z binary.
@@ -50,34 +277,29 @@ class Extractor:
         """
         try:
             # Check if 7z binary exists
-            if os.name == 'nt':  # Windows
-                seven_zip_path = self.find_7zip_windows()
-                if not seven_zip_path:
-                    logging.error("7-Zip executable not found. Please install 7-Zip or use py7zr method.")
-                    return False
-            else:
-                seven_zip_path = '7z'  # Linux/MacOS typically have it in PATH
+            seven_zip_path = self.find_7zip()
+            if not seven_zip_path:
+                logging.error("7-Zip executable not found. Please install 7-Zip or use py7zr method.")
+                return False
             
             # Create extraction directory
             os.makedirs(extract_path, exist_ok=True)
             
-            # Build extraction command
-            cmd = [seven_zip_path, 'x', archive_path, f'-o{extract_path}', '-y']
+            cmd = self.build_7z_command(seven_zip_path, archive_path, extract_path)
             
             logging.info(f"Extracting using command: {' '.join(cmd)}")
             
             # Execute extraction
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
                 stderr=subprocess.PIPE,
-                text=True
+                text=True,
+                **self.get_7z_process_kwargs()
             )
             
-            stdout, stderr = process.communicate()
-            
-            if process.returncode != 0:
-                logging.error(f"Error extracting archive: {stderr}")
+            if result.returncode != 0:
+                logging.error(f"Error extracting archive: {result.stderr}")
                 return False
             
             logging.info(f"Extraction completed successfully")
@@ -87,6 +309,62 @@ class Extractor:
             logging.error(f"Error extracting archive with 7z binary: {e}")
             return False
     
+    def find_7zip(self):
+        """
+        Find a 7-Zip executable for the current platform, caching the result.
+        
+        Returns:
+            str: Path to 7-Zip executable or None if not found
+        """
+        # The lookup stats several locations, so only do it once per extractor
+        if not self._seven_zip_searched:
+            self._seven_zip_path = self.locate_7zip()
+            self._seven_zip_searched = True
+        return self._seven_zip_path
+    
+    def locate_7zip(self):
+        """
+        Search the bundled tools directory and the system for a 7-Zip executable.
+        
+        Returns:
+            str: Path to 7-Zip executable or None if not found
+        """
+        bundled = self.find_bundled_7zip()
+        if bundled:
+            return bundled
+        
+        if os.name == 'nt':  # Windows
+            return self.find_7zip_windows()
+        
+        # Linux/MacOS ship 7-Zip under a few different names
+        for name in ('7z', '7zz', '7za'):
+            path = shutil.which(name)
+            if path:
+                return path
+        
+        return None
+    
+    def find_bundled_7zip(self):
+        """
+        Find a 7-Zip executable shipped in the ``tools`` directory next to this script.
+        
+        Returns:
+            str: Path to the bundled 7-Zip executable or None if not found
+        """
+        tools_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools")
+        
+        if os.name == 'nt':  # Windows
+            names = ("7z.exe", "7za.exe", "7zr.exe")
+        else:
+            names = ("7zz", "7z", "7za", "7zr")
+        
+        for name in names:
+            path = os.path.join(tools_dir, name)
+            if os.path.isfile(path):
+                return path
+        
+        return None
+    
     def find_7zip_windows(self):
         """
         Find 7-Zip executable on Windows systems.
@@ -106,16 +384,11 @@ class Extractor:
                 return path
         
         # Try to find in PATH
-        for path in os.environ["PATH"].split(os.pathsep):
-            exe_file = os.path.join(path, "7z.exe")
-            if os.path.exists(exe_file):
-                return exe_file
-        
-        return None
+        return shutil.which("7z.exe")
     
     def extract_archive(self, archive_path, extract_path):
         """
-        Extract a 7z archive using available methods.
+        Extract a 7z (or .tar.zst) archive using available methods.
         
         Args:
             archive_path: Path to the 7z archive
@@ -128,20 +401,194 @@ class Extractor:
             logging.error(f"Archive does not exist: {archive_path}")
             return False
         
-        # First try with py7zr (pure Python)
+        self.remove_sentinel(extract_path)
+        
+        # Real-time scanning of every extracted file dominates extraction time on Windows
+        excluded = self.add_defender_exclusion(extract_path)
+        try:
+            success = self.extract_archive_contents(archive_path, extract_path)
+        finally:
+            if excluded:
+                self.remove_defender_exclusion(extract_path)
+        
+        if success:
+            self.write_sentinel(extract_path)
+        return success
+    
+    def extract_archive_contents(self, archive_path, extract_path):
+        """
+        Extract an existing archive with the fastest available method.
+        
+        Args:
+            archive_path: Path to the archive
+            extract_path: Path where to extract the contents
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        # zstd snapshots have their own, much faster, extraction path
+        if archive_path.lower().endswith(('.tar.zst', '.tzst')):
+            logging.info("Attempting extraction with zstandard...")
+            return self.extract_tar_zst(archive_path, extract_path)
+        
+        # Prefer the native 7-Zip binary, which decodes on all cores
+        if self.find_7zip():
+            logging.info("Attempting extraction with 7z binary...")
+            if self.extract_7z_binary(archive_path, extract_path):
+                return True
+            logging.warning("7z binary extraction failed, falling back to py7zr")
+        
+        # Fallback to py7zr (pure Python)
         try:
             import py7zr
             logging.info("Attempting extraction with py7zr...")
-            if self.extract_7z_py7zr(archive_path, extract_path):
-                return True
+            return self.extract_7z_py7zr(archive_path, extract_path)
         except ImportError:
-            logging.warning("py7zr not available, falling back to 7z binary")
+            logging.error("py7zr not available and no 7z binary found")
+        except Exception as e:
+            logging.error(f"py7zr extraction failed: {e}")
+        
+        return False
+    
+    async def extract_7z_binary_async(self, archive_path, extract_path):
+        """
+        Extract a 7z archive using the 7z binary without blocking the event loop.
+        
+        Args:
+            archive_path: Path to the 7z archive
+            extract_path: Path where to extract the contents
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            seven_zip_path = self.find_7zip()
+            if not seven_zip_path:
+                logging.error("7-Zip executable not found. Please install 7-Zip or use py7zr method.")
+                return False
+            
+            os.makedirs(extract_path, exist_ok=True)
+            
+            cmd = self.build_7z_command(seven_zip_path, archive_path, extract_path)
+            logging.info(f"Extracting using command: {' '.join(cmd)}")
+            
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+                **self.get_7z_process_kwargs()
+            )
+            _, stderr = await process.communicate()
+            
+            if process.returncode != 0:
+                logging.error(f"Error extracting archive: {stderr.decode(errors='replace')}")
+                return False
+            
+            logging.info(f"Extraction completed successfully")
+            return True
+            
         except Exception as e:
-            logging.warning(f"py7zr extraction failed: {e}, falling back to 7z binary")
+            logging.error(f"Error extracting archive with 7z binary: {e}")
+            return False
+    
+    async def extract_archive_async(self, archive_path, extract_path):
+        """
+        Extract an archive from an asyncio event loop.
+        
+        Mirrors extract_archive, but the 7z binary is awaited as an asyncio
+        subprocess and the pure-Python fallbacks run in a worker thread, so
+        several extractions (or other I/O) can be driven from one event loop.
         
-        # Fallback to 7z binary
-        logging.info("Attempting extraction with 7z binary...")
-        return self.extract_7z_binary(archive_path, extract_path)
+        Args:
+            archive_path: Path to the archive
+            extract_path: Path where to extract the contents
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not os.path.exists(archive_path):
+            logging.error(f"Archive does not exist: {archive_path}")
+            return False
+        
+        loop = asyncio.get_running_loop()
+        
+        self.remove_sentinel(extract_path)
+        
+        excluded = await loop.run_in_executor(None, self.add_defender_exclusion, extract_path)
+        try:
+            success = await self.extract_archive_contents_async(archive_path, extract_path)
+        finally:
+            if excluded:
+                await loop.run_in_executor(None, self.remove_defender_exclusion, extract_path)
+        
+        if success:
+            self.write_sentinel(extract_path)
+        return success
+    
+    async def extract_archive_contents_async(self, archive_path, extract_path):
+        """
+        Extract an existing archive from an asyncio event loop.
+        
+        Args:
+            archive_path: Path to the archive
+            extract_path: Path where to extract the contents
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        loop = asyncio.get_running_loop()
+        
+        if archive_path.lower().endswith(('.tar.zst', '.tzst')):
+            logging.info("Attempting extraction with zstandard...")
+            return await loop.run_in_executor(None, self.extract_tar_zst, archive_path, extract_path)
+        
+        if self.find_7zip():
+            logging.info("Attempting extraction with 7z binary...")
+            if await self.extract_7z_binary_async(archive_path, extract_path):
+                return True
+            logging.warning("7z binary extraction failed, falling back to py7zr")
+        
+        logging.info("Attempting extraction with py7zr...")
+        return await loop.run_in_executor(None, self.extract_7z_py7zr, archive_path, extract_path)
+    
+    def write_sentinel(self, extract_path):
+        """
+        Record the extracted layout so later steps can skip probing for it.
+        
+        Args:
+            extract_path: Path where the archive was extracted
+        """
+        nested_path = os.path.join(extract_path, "ComfyUI_windows_portable_nvidia", "ComfyUI_windows_portable")
+        direct_path = os.path.join(extract_path, "ComfyUI_windows_portable")
+        if os.path.isdir(nested_path):
+            base_path = nested_path
+        elif os.path.isdir(direct_path):
+            base_path = direct_path
+        else:
+            # Not a ComfyUI portable layout; nothing useful to record
+            return
+        
+        # Stored relative to the extraction directory so the install can be moved
+        sentinel = {"base": os.path.relpath(base_path, extract_path)}
+        try:
+            with open(os.path.join(extract_path, SENTINEL_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump(sentinel, f)
+        except OSError as e:
+            logging.warning(f"Could not write extraction sentinel: {str(e)}")
+    
+    def remove_sentinel(self, extract_path):
+        """
+        Remove the sentinel of a previous extraction before extracting again.
+        
+        Args:
+            extract_path: Path where the archive will be extracted
+        """
+        try:
+            os.remove(os.path.join(extract_path, SENTINEL_FILENAME))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not remove extraction sentinel: {str(e)}")
     
     def validate_extraction(self, extract_path, expected_files=None):
         """
@@ -161,10 +608,24 @@ class Extractor:
                 "ComfyUI_windows_portable/run_nvidia_gpu.bat"
             ]
         
+        # List the extraction root once; top-level entries are checked against it
+        try:
+            with os.scandir(extract_path) as entries:
+                present = {entry.name for entry in entries}
+        except OSError as e:
+            logging.error(f"Cannot read extraction directory {extract_path}: {str(e)}")
+            return False
+        
         # Check if the expected files/directories exist
         for file in expected_files:
             file_path = os.path.join(extract_path, file)
-            if not os.path.exists(file_path):
+            parts = os.path.normpath(file).split(os.sep)
+            if len(parts) == 1:
+                found = parts[0] in present
+            else:
+                # Nested paths still need their own lookup
+                found = parts[0] in present and os.path.exists(file_path)
+            if not found:
                 logging.error(f"Expected file/directory not found after extraction: {file_path}")
                 return False
         
@@ -1,16 +1,25 @@
 import os
+import json
 import logging
 import subprocess
 import time
+import queue
+import threading
 import psutil
 from typing import Tuple
+from collections import deque
+from extractor import SENTINEL_FILENAME
+
+# Number of recent ComfyUI output lines kept for diagnostics
+RECENT_OUTPUT_LINES = 50
 
 class FirstRunInitializer:
     """Handles first-run initialization of ComfyUI to set up embedded Python."""
     
     def __init__(self):
         """Initialize the first-run initializer."""
-        pass
+        # install_path -> detected ComfyUI base directory
+        self._base_paths = {}
     
     def find_comfyui_base(self, install_path: str) -> str:
         """
@@ -22,19 +31,61 @@ class FirstRunInitializer:
         Returns:
             str: Path to the ComfyUI base directory
         """
+        # One cache entry per install, whether callers pass it relative or absolute
+        install_path = os.path.abspath(install_path)
+        
+        # Reuse a previously detected layout; only found directories are cached,
+        # so a lookup made before extraction is never remembered
+        if install_path in self._base_paths:
+            return self._base_paths[install_path]
+        
+        # A completed extraction records its layout, which saves probing for it
+        base_path = self.read_sentinel_base(install_path)
+        if base_path:
+            self._base_paths[install_path] = base_path
+            return base_path
+        
         # Check for nested structure (with parent dir)
         nested_path = os.path.join(install_path, "ComfyUI_windows_portable_nvidia", "ComfyUI_windows_portable")
         if os.path.exists(nested_path):
+            self._base_paths[install_path] = nested_path
             return nested_path
         
         # Check for direct structure (without parent dir)
         direct_path = os.path.join(install_path, "ComfyUI_windows_portable")
         if os.path.exists(direct_path):
+            self._base_paths[install_path] = direct_path
             return direct_path
         
         # Return nested path as default (will fail later with clear error)
         return nested_path
     
+    def invalidate_base_cache(self, install_path: str):
+        """
+        Forget the detected ComfyUI base directory, e.g. after re-extracting.
+        
+        Args:
+            install_path: Path where ComfyUI is installed
+        """
+        self._base_paths.pop(os.path.abspath(install_path), None)
+    
+    def read_sentinel_base(self, install_path: str) -> str:
+        """
+        Read the ComfyUI base directory recorded by the extractor, if any.
+        
+        Args:
+            install_path: Path where ComfyUI is installed
+            
+        Returns:
+            str: Recorded base directory, or None if there is no usable sentinel
+        """
+        try:
+            with open(os.path.join(install_path, SENTINEL_FILENAME), 'r', encoding='utf-8') as f:
+                base_path = json.load(f)["base"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return os.path.join(install_path, base_path)
+    
     def get_run_script_path(self, install_path: str) -> str:
         """
         Get the path to the run_nvidia_gpu.bat script.
@@ -123,10 +174,25 @@ class FirstRunInitializer:
         except Exception as e:
             logging.error(f"Error killing process tree: {e}")
     
+    def log_recent_output(self, recent_output):
+        """
+        Log the last lines of ComfyUI output that were not logged as they arrived.
+        
+        Args:
+            recent_output: Iterable of recent output lines
+        """
+        if recent_output:
+            logging.info("Last ComfyUI output:\n" + "\n".join(recent_output))
+    
     def run_first_initialization(self, install_path: str, timeout: int = 300) -> Tuple[bool, str]:
         """
         Run ComfyUI for the first time to initialize the embedded Python environment.
         
+        The portable archive ships python_embeded (including its site-packages),
+        so after a normal extraction this returns immediately without spawning
+        ComfyUI. The run script is only launched when the embedded Python is
+        missing, e.g. for a partial or customised install.
+        
         Args:
             install_path: Path where ComfyUI is installed
             timeout: Maximum time to wait for initialization (seconds)
@@ -134,7 +200,8 @@ class FirstRunInitializer:
         Returns:
             tuple: (success, message)
         """
-        # Check if embedded Python already exists
+        # Check if embedded Python already exists (it is normally extracted with
+        # the archive); if so there is nothing to initialize and no process to spawn
         if self.verify_embedded_python(install_path):
             return True, "Embedded Python already exists, skipping first-run initialization"
         
@@ -149,11 +216,11 @@ class FirstRunInitializer:
             logging.info("This will set up the embedded Python environment")
             logging.info(f"Timeout: {timeout} seconds")
             
-            # Start ComfyUI process
+            # Start ComfyUI process (stderr is merged so a single reader drains both)
             process = subprocess.Popen(
                 [run_script],
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 text=True,
                 bufsize=1,
                 shell=True,
@@ -162,94 +229,90 @@ class FirstRunInitializer:
             
             logging.info(f"ComfyUI process started (PID: {process.pid})")
             
+            # A daemon thread blocks on readline and hands lines over through a
+            # queue, so the monitor below only wakes up when there is output or
+            # a deadline passes. None marks the end of the output.
+            output_queue = queue.Queue()
+            
+            def read_output():
+                for output_line in iter(process.stdout.readline, ''):
+                    output_queue.put(output_line)
+                output_queue.put(None)
+            
+            reader_thread = threading.Thread(target=read_output, daemon=True)
+            reader_thread.start()
+            
             start_time = time.time()
             initialization_detected = False
-            stable_count = 0
             last_output_time = start_time
             
+            # ComfyUI prints thousands of startup lines; only notable ones are
+            # logged as they arrive, the rest are kept for diagnostics on failure
+            recent_output = deque(maxlen=RECENT_OUTPUT_LINES)
+            
             # Monitor the process output
             while True:
                 # Check timeout
-                elapsed = time.time() - start_time
-                if elapsed > timeout:
+                remaining = timeout - (time.time() - start_time)
+                if remaining <= 0:
                     logging.warning(f"Initialization timeout after {timeout} seconds")
+                    self.log_recent_output(recent_output)
                     self.kill_process_tree(process.pid)
                     return False, f"First-run initialization timed out after {timeout} seconds"
                 
-                # Check if process is still running
-                if process.poll() is not None:
-                    stdout, stderr = process.communicate()
-                    if stdout:
-                        logging.info(f"Process output: {stdout}")
-                    if stderr:
-                        logging.error(f"Process error: {stderr}")
+                # Once the server is up, only wait until it has been quiet for 5 seconds
+                wait = remaining
+                if initialization_detected:
+                    wait = min(wait, max(0, 5 - (time.time() - last_output_time)))
+                
+                try:
+                    line = output_queue.get(timeout=wait)
+                except queue.Empty:
+                    line = ''
+                
+                # Output closed: the process has exited
+                if line is None:
+                    process.wait()
                     
                     # Check if embedded Python now exists
                     if self.verify_embedded_python(install_path):
                         return True, "ComfyUI first-run initialization completed successfully"
                     else:
+                        self.log_recent_output(recent_output)
                         return False, "ComfyUI process terminated but embedded Python not found"
                 
-                # Read output line by line (non-blocking)
-                try:
-                    # Use a small timeout to avoid blocking forever
-                    import select
-                    if hasattr(select, 'select'):
-                        # Unix-like systems
-                        ready = select.select([process.stdout], [], [], 0.1)
-                        if ready[0]:
-                            line = process.stdout.readline()
-                        else:
-                            line = None
-                    else:
-                        # Windows - just try to read
-                        line = process.stdout.readline() if process.stdout else None
+                line = line.strip()
+                if line:
+                    recent_output.append(line)
+                    last_output_time = time.time()
                     
-                    if line:
-                        line = line.strip()
-                        if line:
-                            logging.info(f"ComfyUI: {line}")
-                            last_output_time = time.time()
-                            
-                            # Check for initialization completion indicators
-                            if "To see the GUI go to:" in line or "http://127.0.0.1:8188" in line:
-                                initialization_detected = True
-                                logging.info("ComfyUI server is ready!")
+                    # Check for initialization completion indicators
+                    if "To see the GUI go to:" in line or "http://127.0.0.1:8188" in line:
+                        logging.info(f"ComfyUI: {line}")
+                        initialization_detected = True
+                        logging.info("ComfyUI server is ready!")
+                    elif "error" in line.lower():
+                        logging.info(f"ComfyUI: {line}")
+                
+                # If we detected initialization, wait for 5 seconds of stability
+                if initialization_detected and time.time() - last_output_time >= 5:
+                    logging.info("ComfyUI appears stable, proceeding to shutdown...")
                     
-                    # If we detected initialization, wait for stability
-                    if initialization_detected:
-                        time_since_output = time.time() - last_output_time
+                    # Give it a bit more time to ensure everything is initialized
+                    time.sleep(3)
+                    
+                    # Verify embedded Python exists
+                    if self.verify_embedded_python(install_path):
+                        logging.info("Shutting down ComfyUI...")
+                        self.kill_process_tree(process.pid)
                         
-                        # Wait for 5 seconds of stability
-                        if time_since_output >= 5:
-                            stable_count += 1
-                            if stable_count >= 1:
-                                logging.info("ComfyUI appears stable, proceeding to shutdown...")
-                                
-                                # Give it a bit more time to ensure everything is initialized
-                                time.sleep(3)
-                                
-                                # Verify embedded Python exists
-                                if self.verify_embedded_python(install_path):
-                                    logging.info("Shutting down ComfyUI...")
-                                    self.kill_process_tree(process.pid)
-                                    
-                                    # Wait a moment for cleanup
-                                    time.sleep(2)
-                                    
-                                    return True, "ComfyUI first-run initialization completed successfully"
-                                else:
-                                    logging.warning("Initialization detected but embedded Python still not found, waiting...")
-                                    initialization_detected = False
-                                    stable_count = 0
-                        else:
-                            stable_count = 0
-                
-                except Exception as e:
-                    logging.debug(f"Error reading output: {e}")
-                
-                # Small delay to prevent busy waiting
-                time.sleep(0.1)
+                        # Wait a moment for cleanup
+                        time.sleep(2)
+                        
+                        return True, "ComfyUI first-run initialization completed successfully"
+                    else:
+                        logging.warning("Initialization detected but embedded Python still not found, waiting...")
+                        initialization_detected = False
         
         except Exception as e:
             logging.error(f"Error during first-run initialization: {e}")
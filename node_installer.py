@@ -3,15 +3,22 @@ import logging
 import subprocess
 import sys
 import re
+import codecs
 from typing import List, Tuple, Optional
 import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# GitHub URL validation pattern
+GITHUB_URL_PATTERN = re.compile(r'^https://github\.com/[a-zA-Z0-9-]+/[a-zA-Z0-9-._]+/?$')
 
 class NodeInstaller:
     """Handles installation of custom nodes for ComfyUI."""
     
     def __init__(self):
         """Initialize the node installer."""
-        pass
+        # install_path -> detected ComfyUI base directory
+        self._base_paths = {}
     
     def validate_github_urls(self, urls: List[str]) -> Tuple[bool, str, List[str]]:
         """
@@ -35,9 +42,7 @@ class NodeInstaller:
             if not url:
                 continue
                 
-            # GitHub URL validation pattern
-            pattern = r'^https://github\.com/[a-zA-Z0-9-]+/[a-zA-Z0-9-._]+/?$'
-            if re.match(pattern, url):
+            if GITHUB_URL_PATTERN.match(url):
                 valid_urls.append(url)
             else:
                 invalid_urls.append(url)
@@ -64,8 +69,16 @@ class NodeInstaller:
             if not os.path.exists(repo_list_path):
                 return False, f"Repository list file not found: {repo_list_path}", []
             
-            with open(repo_list_path, 'r') as f:
-                urls = [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+            # Read the raw bytes in one call and split/filter them before decoding,
+            # so only the lines that are kept ever become str objects
+            with open(repo_list_path, 'rb') as f:
+                data = f.read()
+            
+            if data.startswith(codecs.BOM_UTF8):
+                data = data[len(codecs.BOM_UTF8):]
+            
+            urls = [line.decode('utf-8') for line in map(bytes.strip, data.splitlines())
+                    if line and not line.startswith(b'#')]
             
             if not urls:
                 return False, f"No URLs found in the repository list: {repo_list_path}", []
@@ -86,19 +99,38 @@ class NodeInstaller:
         Returns:
             str: Path to the ComfyUI base directory
         """
+        # One cache entry per install, whether callers pass it relative or absolute
+        install_path = os.path.abspath(install_path)
+        
+        # Reuse a previously detected layout; only found directories are cached,
+        # so a lookup made before extraction is never remembered
+        if install_path in self._base_paths:
+            return self._base_paths[install_path]
+        
         # Check for nested structure (with parent dir)
         nested_path = os.path.join(install_path, "ComfyUI_windows_portable_nvidia", "ComfyUI_windows_portable")
         if os.path.exists(nested_path):
+            self._base_paths[install_path] = nested_path
             return nested_path
         
         # Check for direct structure (without parent dir)
         direct_path = os.path.join(install_path, "ComfyUI_windows_portable")
         if os.path.exists(direct_path):
+            self._base_paths[install_path] = direct_path
             return direct_path
         
         # Return nested path as default (will fail later with clear error)
         return nested_path
     
+    def invalidate_base_cache(self, install_path: str):
+        """
+        Forget the detected ComfyUI base directory, e.g. after re-extracting.
+        
+        Args:
+            install_path: Path where ComfyUI is installed
+        """
+        self._base_paths.pop(os.path.abspath(install_path), None)
+    
     def get_custom_nodes_path(self, install_path: str) -> str:
         """
         Get the path to the custom_nodes directory.
@@ -112,13 +144,17 @@ class NodeInstaller:
         base_path = self.find_comfyui_base(install_path)
         return os.path.join(base_path, "ComfyUI", "custom_nodes")
     
-    def create_installation_script(self, custom_nodes_path: str, repos: List[str]) -> Tuple[bool, str]:
+    def create_installation_script(self, custom_nodes_path: str, repos: List[str], max_workers: int = 16) -> Tuple[bool, str]:
         """
-        Create a Python script that will clone the repositories.
+        Create a standalone Python script that will clone the repositories.
+        
+        install_custom_nodes performs the installation in-process; the script is
+        kept for debugging or re-running an installation by hand.
         
         Args:
             custom_nodes_path: Path to the custom_nodes directory
             repos: List of repository URLs
+            max_workers: Number of repositories to clone concurrently
             
         Returns:
             tuple: (success, message)
@@ -134,10 +170,59 @@ class NodeInstaller:
 import os
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Repositories to clone
 repositories = {repos}
 
+# Number of repositories cloned at the same time
+MAX_WORKERS = {max_workers}
+
+def get_repo_name(repo):
+    return repo.rstrip('/').split('/')[-1].replace('.git', '')
+
+def clone_repo(custom_nodes_dir, repo):
+    repo_name = get_repo_name(repo)
+    target_dir = os.path.join(custom_nodes_dir, repo_name)
+    
+    # Check if directory already exists
+    if os.path.exists(target_dir):
+        cmd = ["git", "-C", target_dir, "pull", "--ff-only"]
+    else:
+        cmd = ["git", "clone", "--depth=1", "--filter=blob:none", "--single-branch", repo, target_dir]
+    
+    # Fail instead of hanging on a credential prompt for a private or missing repo
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    )
+    
+    stdout, stderr = process.communicate()
+    
+    return repo_name, target_dir, process.returncode == 0, stdout if process.returncode == 0 else stderr
+
+def pip_install(req_files):
+    # Get path to python executable
+    python_path = sys.executable
+    
+    cmd = [python_path, "-m", "pip", "install", "--no-input", "--disable-pip-version-check"]
+    for req_file in req_files:
+        cmd += ["-r", req_file]
+    
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    
+    stdout, stderr = process.communicate()
+    
+    return process.returncode == 0, stderr
+
 def main():
     # Get the current directory (should be the custom_nodes directory)
     custom_nodes_dir = os.path.abspath(os.path.dirname(__file__))
@@ -145,70 +230,68 @@ def main():
     
     success_count = 0
     failed_repos = []
+    cloned = []
     
+    # Repositories with the same name would be cloned into the same directory at once
+    repos_by_dir = {{}}
     for repo in repositories:
-        repo_name = repo.split('/')[-1].replace('.git', '')
-        print(f"\\nProcessing {{repo_name}} from {{repo}}")
-        
-        # Clone the repository
-        try:
-            # Check if directory already exists
-            target_dir = os.path.join(custom_nodes_dir, repo_name)
-            if os.path.exists(target_dir):
-                print(f"Directory already exists: {{target_dir}}")
-                print(f"Pulling latest changes...")
-                cmd = ["git", "-C", target_dir, "pull"]
-            else:
-                print(f"Cloning {{repo}}...")
-                cmd = ["git", "clone", repo, target_dir]
-            
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            stdout, stderr = process.communicate()
-            
-            if process.returncode != 0:
-                print(f"Error: {{stderr}}")
+        target_dir = os.path.normcase(os.path.join(custom_nodes_dir, get_repo_name(repo)))
+        if target_dir in repos_by_dir:
+            print(f"Skipping {{repo}}: {{repos_by_dir[target_dir]}} uses the same directory")
+            failed_repos.append(repo)
+        else:
+            repos_by_dir[target_dir] = repo
+    
+    # Clone all repositories concurrently; each clone is dominated by network latency
+    print(f"Cloning {{len(repos_by_dir)}} repositories ({{MAX_WORKERS}} at a time)...")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {{executor.submit(clone_repo, custom_nodes_dir, repo): repo for repo in repos_by_dir.values()}}
+        for future in as_completed(futures):
+            repo = futures[future]
+            try:
+                repo_name, target_dir, ok, output = future.result()
+            except Exception as e:
+                print(f"Error processing {{repo}}: {{e}}")
                 failed_repos.append(repo)
                 continue
             
-            print(stdout)
-            
-            # Check for requirements.txt
-            req_file = os.path.join(target_dir, "requirements.txt")
-            if os.path.exists(req_file):
-                print(f"Installing requirements...")
-                
-                # Get path to python executable
-                python_path = sys.executable
-                
-                # Install requirements
-                cmd = [python_path, "-m", "pip", "install", "-r", req_file]
-                
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                
-                stdout, stderr = process.communicate()
-                
-                if process.returncode != 0:
-                    print(f"Error installing requirements: {{stderr}}")
-                else:
-                    print("Requirements installed successfully")
-            
-            success_count += 1
-            print(f"Successfully installed {{repo_name}}")
+            if not ok:
+                print(f"\\nError cloning {{repo_name}}: {{output}}")
+                failed_repos.append(repo)
+                continue
             
-        except Exception as e:
-            print(f"Error processing {{repo}}: {{e}}")
-            failed_repos.append(repo)
+            print(f"\\nFetched {{repo_name}} from {{repo}}")
+            if output:
+                print(output)
+            cloned.append((repo, repo_name, target_dir))
+    
+    # Install every node's requirements in a single pip run, so pip starts and
+    # resolves shared dependencies once instead of once per node
+    req_files = []
+    for repo, repo_name, target_dir in cloned:
+        # Check for requirements.txt
+        req_file = os.path.join(target_dir, "requirements.txt")
+        if os.path.exists(req_file):
+            req_files.append((repo_name, req_file))
+    
+    if req_files:
+        print(f"\\nInstalling requirements for {{len(req_files)}} nodes...")
+        ok, stderr = pip_install([req_file for _, req_file in req_files])
+        
+        if ok:
+            print("Requirements installed successfully")
+        else:
+            # Fall back to one run per node so a single bad requirement
+            # doesn't block the others and the failing node is identified
+            print(f"Combined requirements install failed, retrying each node separately:\\n{{stderr}}")
+            for repo_name, req_file in req_files:
+                ok, stderr = pip_install([req_file])
+                if not ok:
+                    print(f"Error installing requirements for {{repo_name}}: {{stderr}}")
+    
+    for repo, repo_name, target_dir in cloned:
+        success_count += 1
+        print(f"Successfully installed {{repo_name}}")
     
     # Summary
     print("\\n" + "="*50)
@@ -235,13 +318,224 @@ if __name__ == "__main__":
             logging.error(f"Error creating installation script: {e}")
             return False, f"Error creating installation script: {e}"
     
-    def install_custom_nodes(self, install_path: str, repo_list_path: str) -> Tuple[bool, str]:
+    def get_repo_name(self, repo: str) -> str:
+        """
+        Get the directory name a repository is cloned into.
+        
+        Args:
+            repo: Repository URL
+            
+        Returns:
+            str: Repository name
+        """
+        return repo.rstrip('/').split('/')[-1].replace('.git', '')
+    
+    def clone_repo(self, custom_nodes_path: str, repo: str) -> Tuple[str, str, bool, str]:
+        """
+        Clone a repository, or update it if it is already checked out.
+        
+        Args:
+            custom_nodes_path: Path to the custom_nodes directory
+            repo: Repository URL
+            
+        Returns:
+            tuple: (repo_name, target_dir, success, output)
+        """
+        repo_name = self.get_repo_name(repo)
+        target_dir = os.path.join(custom_nodes_path, repo_name)
+        
+        # Check if directory already exists
+        if os.path.exists(target_dir):
+            cmd = ["git", "-C", target_dir, "pull", "--ff-only"]
+        else:
+            cmd = ["git", "clone", "--depth=1", "--filter=blob:none", "--single-branch", repo, target_dir]
+        
+        # Fail instead of hanging on a credential prompt for a private or missing repo
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=dict(os.environ, GIT_TERMINAL_PROMPT="0")
+        )
+        
+        stdout, stderr = process.communicate()
+        
+        if process.returncode != 0:
+            return repo_name, target_dir, False, stderr
+        return repo_name, target_dir, True, stdout
+    
+    def pip_install(self, python_path: str, req_files: List[str]) -> Tuple[bool, str]:
+        """
+        Install one or more requirements files with a single pip run.
+        
+        Args:
+            python_path: Python executable whose environment receives the packages
+            req_files: Paths to requirements.txt files
+            
+        Returns:
+            tuple: (success, stderr)
+        """
+        cmd = [python_path, "-m", "pip", "install", "--no-input", "--disable-pip-version-check"]
+        for req_file in req_files:
+            cmd += ["-r", req_file]
+        
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        
+        stdout, stderr = process.communicate()
+        
+        return process.returncode == 0, stderr
+    
+    def prefetch_and_install(self, python_path: str, req_files: List[str]) -> Tuple[bool, str]:
+        """
+        Download all requirements into a local wheel directory, then install offline.
+        
+        ``pip download`` resolves and fetches every distribution in one pass,
+        after which ``pip install --no-index`` only copies from local files.
+        Falls back to a regular online install if the download step fails.
+        
+        Args:
+            python_path: Python executable whose environment receives the packages
+            req_files: Paths to requirements.txt files
+            
+        Returns:
+            tuple: (success, stderr)
+        """
+        req_args = []
+        for req_file in req_files:
+            req_args += ["-r", req_file]
+        
+        with tempfile.TemporaryDirectory(prefix="comfyui-wheels-") as wheel_dir:
+            cmd = [python_path, "-m", "pip", "download", "--no-input", "--disable-pip-version-check",
+                   "-d", wheel_dir] + req_args
+            
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+            
+            stdout, stderr = process.communicate()
+            
+            if process.returncode != 0:
+                logging.warning(f"Prefetching requirements failed, installing online instead: {stderr}")
+                return self.pip_install(python_path, req_files)
+            
+            cmd = [python_path, "-m", "pip", "install", "--no-input", "--disable-pip-version-check",
+                   "--no-index", "--find-links", wheel_dir] + req_args
+            
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+            
+            stdout, stderr = process.communicate()
+            
+            return process.returncode == 0, stderr
+    
+    def clone_and_install(self, custom_nodes_path: str, repos: List[str], python_path: str,
+                          max_workers: int = 16, prefetch_wheels: bool = False) -> Tuple[int, List[str]]:
+        """
+        Clone custom node repositories concurrently and install their requirements.
+        
+        Args:
+            custom_nodes_path: Path to the custom_nodes directory
+            repos: List of repository URLs
+            python_path: Python executable used to install requirements
+            max_workers: Number of repositories to clone concurrently
+            prefetch_wheels: Download all requirements before installing them offline.
+                Off by default because ``pip download`` also fetches packages that
+                are already installed (such as torch) instead of skipping them.
+            
+        Returns:
+            tuple: (success_count, failed_repos)
+        """
+        os.makedirs(custom_nodes_path, exist_ok=True)
+        logging.info(f"Installing custom nodes to: {custom_nodes_path}")
+        
+        failed_repos = []
+        cloned = []
+        
+        # Repositories with the same name would be cloned into the same directory at once
+        repos_by_dir = {}
+        for repo in repos:
+            target_dir = os.path.normcase(os.path.join(custom_nodes_path, self.get_repo_name(repo)))
+            if target_dir in repos_by_dir:
+                logging.error(f"Skipping {repo}: {repos_by_dir[target_dir]} uses the same directory")
+                failed_repos.append(repo)
+            else:
+                repos_by_dir[target_dir] = repo
+        
+        # Clone all repositories concurrently; each clone is dominated by network latency
+        logging.info(f"Cloning {len(repos_by_dir)} repositories ({max_workers} at a time)...")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.clone_repo, custom_nodes_path, repo): repo for repo in repos_by_dir.values()}
+            for future in as_completed(futures):
+                repo = futures[future]
+                try:
+                    repo_name, target_dir, ok, output = future.result()
+                except Exception as e:
+                    logging.error(f"Error processing {repo}: {e}")
+                    failed_repos.append(repo)
+                    continue
+                
+                if not ok:
+                    logging.error(f"Error cloning {repo_name}: {output}")
+                    failed_repos.append(repo)
+                    continue
+                
+                logging.info(f"Fetched {repo_name} from {repo}")
+                cloned.append((repo, repo_name, target_dir))
+        
+        # Install every node's requirements in a single pip run, so pip starts and
+        # resolves shared dependencies once instead of once per node
+        req_files = []
+        for repo, repo_name, target_dir in cloned:
+            req_file = os.path.join(target_dir, "requirements.txt")
+            if os.path.exists(req_file):
+                req_files.append((repo_name, req_file))
+        
+        if req_files:
+            logging.info(f"Installing requirements for {len(req_files)} nodes...")
+            all_req_files = [req_file for _, req_file in req_files]
+            if prefetch_wheels:
+                ok, stderr = self.prefetch_and_install(python_path, all_req_files)
+            else:
+                ok, stderr = self.pip_install(python_path, all_req_files)
+            
+            if ok:
+                logging.info("Requirements installed successfully")
+            else:
+                # Fall back to one run per node so a single bad requirement
+                # doesn't block the others and the failing node is identified
+                logging.warning(f"Combined requirements install failed, retrying each node separately: {stderr}")
+                for repo_name, req_file in req_files:
+                    ok, stderr = self.pip_install(python_path, [req_file])
+                    if not ok:
+                        logging.error(f"Error installing requirements for {repo_name}: {stderr}")
+        
+        for repo, repo_name, target_dir in cloned:
+            logging.info(f"Successfully installed {repo_name}")
+        
+        return len(cloned), failed_repos
+    
+    def install_custom_nodes(self, install_path: str, repo_list_path: str,
+                             prefetch_wheels: bool = False) -> Tuple[bool, str]:
         """
         Install custom nodes from a repository list.
         
         Args:
             install_path: Path where ComfyUI is installed
             repo_list_path: Path to the repository list file
+            prefetch_wheels: Download all requirements before installing them offline
             
         Returns:
             tuple: (success, message)
@@ -259,15 +553,7 @@ if __name__ == "__main__":
         if not success:
             return False, message
         
-        # Create installation script
-        success, message = self.create_installation_script(custom_nodes_path, valid_repos)
-        if not success:
-            return False, message
-        
-        # Run the installation script
         try:
-            logging.info(f"Running installation script...")
-            
             # Get path to python inside the ComfyUI portable
             base_path = self.find_comfyui_base(install_path)
             comfyui_python = os.path.join(base_path, "python_embeded", "python.exe")
@@ -280,30 +566,15 @@ if __name__ == "__main__":
             
             logging.info(f"Using ComfyUI embedded Python: {comfyui_python}")
             
-            script_path = os.path.join(custom_nodes_path, "install_custom_nodes.py")
-            
-            cmd = [comfyui_python, script_path]
-            
-            logging.info(f"Running command: {' '.join(cmd)}")
-            
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=custom_nodes_path
+            # Clone in this process; the embedded Python is only needed for pip
+            success_count, failed_repos = self.clone_and_install(
+                custom_nodes_path, valid_repos, comfyui_python, prefetch_wheels=prefetch_wheels
             )
             
-            stdout, stderr = process.communicate()
-            
-            if stdout:
-                logging.info(stdout)
+            logging.info(f"Installation complete: {success_count} successful, {len(failed_repos)} failed")
             
-            if stderr:
-                logging.error(stderr)
-            
-            if process.returncode != 0:
-                return False, f"Error installing custom nodes: {stderr}"
+            if failed_repos:
+                return False, f"Failed to install {len(failed_repos)} of {len(valid_repos)} custom nodes: {', '.join(failed_repos)}"
             
             return True, f"Custom nodes installed successfully from {repo_list_path}"
             
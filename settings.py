@@ -1,85 +1,275 @@
 import os
+import stat
+import errno
 import json
+import copy
+import codecs
 import logging
+import time
+import threading
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Logging is configured by the application (see comfyui_recovery.setup_logging)
+logger = logging.getLogger(__name__)
+
+# Settings that must be set before a recovery can run
+REQUIRED_SETTINGS = ("install_path", "models_path")
+
+# How long a remembered path_exists answer is trusted, in seconds
+PATH_CACHE_TTL = 2.0
+
+# Most path_exists answers remembered before the cache is emptied
+PATH_CACHE_SIZE = 256
+
+# Absolute path -> (exists, time checked)
+_path_cache = {}
+
+def path_exists(path):
+    """
+    Check whether a path exists, remembering the answer for a short time.
+    
+    The same few paths are checked repeatedly while validating settings and
+    setting up the install. Answers are keyed by absolute path, so a relative
+    path is not confused across working directories, and expire after
+    PATH_CACHE_TTL seconds; call invalidate_path_cache() after creating or
+    removing anything on disk.
+    
+    Args:
+        path: Path to check
+        
+    Returns:
+        bool: True if the path exists, False otherwise
+    """
+    key = os.path.abspath(path)
+    now = time.monotonic()
+    cached = _path_cache.get(key)
+    if cached is not None and now - cached[1] < PATH_CACHE_TTL:
+        return cached[0]
+    
+    # access(F_OK) answers yes/no without fetching the full stat result
+    # (GetFileAttributesW rather than opening the file on Windows)
+    exists = os.access(key, os.F_OK)
+    if len(_path_cache) >= PATH_CACHE_SIZE:
+        _path_cache.clear()
+    _path_cache[key] = (exists, now)
+    return exists
+
+def invalidate_path_cache():
+    """Forget all remembered path_exists results."""
+    _path_cache.clear()
+
+def probe_path(path):
+    """
+    Inspect a path with a single lstat call instead of separate exists/isdir/islink calls.
+    
+    Args:
+        path: Path to inspect
+        
+    Returns:
+        tuple: (exists, is_dir, is_symlink); is_dir is True for a symlink to a directory
+    """
+    try:
+        st = os.lstat(path)
+    except OSError as e:
+        if e.errno in (errno.ENOENT, errno.ENOTDIR):
+            return False, False, False
+        raise
+    
+    if not stat.S_ISLNK(st.st_mode):
+        return True, stat.S_ISDIR(st.st_mode), False
+    
+    # Only a symlink needs a second call, to see what it points at
+    try:
+        st = os.stat(path)
+    except OSError:
+        return True, False, True
+    return True, stat.S_ISDIR(st.st_mode), True
+
+def is_nonempty_dir(path):
+    """
+    Check whether a directory has any entries without listing all of them.
+    
+    Args:
+        path: Path to a directory
+        
+    Returns:
+        bool: True if the directory contains at least one entry
+    """
+    with os.scandir(path) as entries:
+        return next(entries, None) is not None
 
 class SettingsManager:
     """Manages application settings and configuration."""
     
+    # Parsed settings files shared by all instances, keyed by path and
+    # holding ((mtime_ns, size), settings) so unchanged files aren't reparsed
+    file_cache = {}
+    
+    # Shared managers returned by get(), keyed by absolute config file path
+    instances = {}
+    
+    @classmethod
+    def get(cls, config_file="settings.json"):
+        """
+        Get the shared settings manager for a config file.
+        
+        Args:
+            config_file: Path to the config file
+            
+        Returns:
+            SettingsManager: The manager for that file, created on first use
+        """
+        config_file = os.path.abspath(config_file)
+        if config_file not in cls.instances:
+            manager = cls(config_file)
+            # Load now, before the manager can be shared with other threads
+            manager.load_settings()
+            cls.instances[config_file] = manager
+        return cls.instances[config_file]
+    
     def __init__(self, config_file="settings.json"):
-        """Initialize settings manager with the path to the config file."""
+        """
+        Initialize settings manager with the path to the config file.
+        
+        The file is read on first access to the settings, not here.
+        """
         self.config_file = os.path.abspath(config_file)
-        self.settings = {
+        self.loaded = False
+        self._load_lock = threading.Lock()
+        self._settings = {
             "comfyui_url": "https://github.com/comfyanonymous/ComfyUI/releases/download/v0.3.27/ComfyUI_windows_portable_nvidia.7z",
             "install_path": "",
             "models_path": "",
             "repo_list_path": "RepoLists/default.txt",
             "cached_version": "",
-            "cached_archive_path": ""
+            "cached_archive_path": "",
+            "github_latest_cache": {}
         }
-        self.load_settings()
+        # key -> (raw value, absolute path); kept out of the saved settings
+        self.abs_paths = {}
+    
+    @property
+    def settings(self):
+        """Settings dictionary, loaded from the config file on first access."""
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    self.load_settings()
+        return self._settings
     
     def load_settings(self):
         """Load settings from the config file if it exists."""
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r') as f:
-                    loaded_settings = json.load(f)
-                    # Update settings with loaded values
-                    self.settings.update(loaded_settings)
-                logging.info(f"Settings loaded from {self.config_file}")
+            try:
+                st = os.stat(self.config_file)
+            except FileNotFoundError:
+                logger.info("No settings file found at %s", self.config_file)
+                return
+            
+            file_key = (st.st_mtime_ns, st.st_size)
+            cached = self.file_cache.get(self.config_file)
+            if cached and cached[0] == file_key:
+                loaded_settings = cached[1]
             else:
-                logging.info(f"No settings file found at {self.config_file}")
+                # Both parsers take the raw bytes, so no text decoding layer is needed
+                with open(self.config_file, 'rb') as f:
+                    data = f.read()
+                # Editors such as Notepad may save with a BOM, which orjson rejects
+                if data.startswith(codecs.BOM_UTF8):
+                    data = data[len(codecs.BOM_UTF8):]
+                loaded_settings = orjson.loads(data) if orjson else json.loads(data)
+                self.file_cache[self.config_file] = (file_key, loaded_settings)
+            
+            # Update settings with loaded values; copied so the cached values stay untouched
+            self._settings.update(copy.deepcopy(loaded_settings))
+            logger.info("Settings loaded from %s", self.config_file)
         except Exception as e:
-            logging.error(f"Error loading settings: {e}")
+            logger.error("Error loading settings: %s", e)
+        finally:
+            # Only set once the loaded values are in place, so no thread can
+            # read defaults and have them replaced by the file afterwards
+            self.loaded = True
     
     def save_settings(self):
         """Save current settings to the config file."""
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.settings, f, indent=4)
-            logging.info(f"Settings saved to {self.config_file}")
+            if orjson:
+                data = orjson.dumps(self.settings, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+            else:
+                data = (json.dumps(self.settings, indent=4) + '\n').encode('utf-8')
+            
+            # Write to a temporary file and swap it in so a crash never leaves a partial file
+            tmp_file = self.config_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.config_file)
+            invalidate_path_cache()
+            
+            # What was just written is what the next load would parse
+            st = os.stat(self.config_file)
+            self.file_cache[self.config_file] = (
+                (st.st_mtime_ns, st.st_size),
+                copy.deepcopy(self.settings)
+            )
+            logger.info("Settings saved to %s", self.config_file)
             return True
         except Exception as e:
-            logging.error(f"Error saving settings: {e}")
+            logger.error("Error saving settings: %s", e)
             return False
     
     def update_setting(self, key, value):
         """Update a specific setting."""
         if key in self.settings:
             self.settings[key] = value
+            invalidate_path_cache()
             return True
         else:
-            logging.warning(f"Unknown setting key: {key}")
+            logger.warning("Unknown setting key: %s", key)
             return False
     
     def get_setting(self, key, default=None):
         """Get a specific setting value."""
         return self.settings.get(key, default)
     
-    def validate_settings(self):
-        """Validate required settings."""
-        required_settings = ["install_path", "models_path"]
+    def get_abs_path(self, key):
+        """
+        Get a path setting as an absolute path, normalizing each value only once.
         
-        missing_settings = [s for s in required_settings if not self.settings.get(s)]
+        Args:
+            key: Name of a path setting
+            
+        Returns:
+            str: Absolute path, or the raw value if the setting is empty
+        """
+        value = self.settings.get(key)
+        if not value:
+            return value
         
-        if missing_settings:
-            logging.warning(f"Missing required settings: {', '.join(missing_settings)}")
+        cached = self.abs_paths.get(key)
+        if cached is None or cached[0] != value:
+            cached = (value, os.path.abspath(value))
+            self.abs_paths[key] = cached
+        return cached[1]
+    
+    def validate_settings(self):
+        """Validate required settings."""
+        # Only build the list of missing settings when something is missing
+        if any(not self.settings.get(s) for s in REQUIRED_SETTINGS):
+            missing_settings = [s for s in REQUIRED_SETTINGS if not self.settings.get(s)]
+            logger.warning("Missing required settings: %s", ', '.join(missing_settings))
             return False, missing_settings
         
         # Check if paths exist
-        if not os.path.exists(os.path.dirname(self.settings["install_path"])):
+        if not path_exists(os.path.dirname(self.settings["install_path"])):
             return False, ["Parent directory of install_path does not exist"]
         
-        if not os.path.exists(self.settings["models_path"]):
+        if not path_exists(self.settings["models_path"]):
             return False, ["models_path does not exist"]
             
         return True, []
@@ -93,15 +283,15 @@ class SettingsManager:
         
         # Check if parent directory exists
         parent_dir = os.path.dirname(install_path)
-        if not os.path.exists(parent_dir):
+        if not path_exists(parent_dir):
             return False, f"Parent directory does not exist: {parent_dir}"
         
         # Check if path exists and is not empty
-        if os.path.exists(install_path):
-            try:
-                if os.path.isdir(install_path) and os.listdir(install_path):
-                    return False, f"Installation path is not empty: {install_path}"
-            except Exception as e:
-                return False, f"Error checking installation path: {e}"
+        try:
+            _, is_dir, _ = probe_path(install_path)
+            if is_dir and is_nonempty_dir(install_path):
+                return False, f"Installation path is not empty: {install_path}"
+        except Exception as e:
+            return False, f"Error checking installation path: {e}"
         
         return True, "Installation path is valid and empty"
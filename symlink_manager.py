@@ -1,15 +1,30 @@
 import os
+import sys
 import logging
-import subprocess
 import shutil
 import ctypes
+from settings import path_exists, invalidate_path_cache, probe_path
+
+logger = logging.getLogger(__name__)
+
+# Windows error raised when symlinks need admin rights or Developer Mode
+ERROR_PRIVILEGE_NOT_HELD = 1314
+
+# Fixed locations inside a ComfyUI portable install, joined once at import
+NESTED_BASE_DIR = os.path.join("ComfyUI_windows_portable_nvidia", "ComfyUI_windows_portable")
+DIRECT_BASE_DIR = "ComfyUI_windows_portable"
+MODELS_DIR = os.path.join("ComfyUI", "models")
+PYTHON_SCRIPTS_DIR = os.path.join("python_embeded", "Scripts")
 
 class SymlinkManager:
     """Manages symbolic links between folders."""
     
     def __init__(self):
         """Initialize the symlink manager."""
-        pass
+        # install_path -> detected ComfyUI base directory
+        self._base_paths = {}
+        # Privileges don't change while the process runs; checked on first use
+        self._is_admin = None
     
     def is_admin(self):
         """
@@ -18,13 +33,33 @@ class SymlinkManager:
         Returns:
             bool: True if running as admin, False otherwise
         """
-        try:
-            if os.name == 'nt':  # Windows
-                return ctypes.windll.shell32.IsUserAnAdmin() != 0
-            else:
-                return os.geteuid() == 0
-        except Exception:
-            return False
+        if self._is_admin is None:
+            try:
+                if os.name == 'nt':  # Windows
+                    self._is_admin = ctypes.windll.shell32.IsUserAnAdmin() != 0
+                else:
+                    self._is_admin = os.geteuid() == 0
+            except Exception:
+                self._is_admin = False
+        return self._is_admin
+    
+    def remove_tree(self, path):
+        """
+        Remove a directory tree, ignoring entries that disappear while it is removed.
+        
+        Args:
+            path: Directory to remove
+        """
+        def ignore_missing(func, failed_path, exc_info):
+            exc = exc_info[1] if isinstance(exc_info, tuple) else exc_info
+            if not isinstance(exc, FileNotFoundError):
+                raise exc
+        
+        # onerror is deprecated in favour of onexc from Python 3.12
+        if sys.version_info >= (3, 12):
+            shutil.rmtree(path, onexc=ignore_missing)
+        else:
+            shutil.rmtree(path, onerror=ignore_missing)
     
     def create_symlink(self, source_path, target_path, force=False):
         """
@@ -39,66 +74,75 @@ class SymlinkManager:
             tuple: (success, message)
         """
         try:
-            # Normalize paths
-            source_path = os.path.abspath(source_path)
-            target_path = os.path.abspath(target_path)
+            # Normalize paths; callers usually pass paths that are already absolute
+            if not os.path.isabs(source_path):
+                source_path = os.path.abspath(source_path)
+            if not os.path.isabs(target_path):
+                target_path = os.path.abspath(target_path)
             
             # Validate paths
             if not os.path.exists(target_path):
                 return False, f"Target path does not exist: {target_path}"
             
+            # Nothing to do if the link already points at the target (repeat runs)
+            try:
+                current_target = os.readlink(source_path)
+            except OSError:
+                current_target = None
+            if current_target:
+                if current_target.startswith('\\\\?\\'):
+                    current_target = current_target[4:]
+                current_target = os.path.join(os.path.dirname(source_path), current_target)
+                if os.path.normcase(os.path.abspath(current_target)) == os.path.normcase(os.path.normpath(target_path)):
+                    logger.info("Symlink already in place: %s -> %s", source_path, target_path)
+                    return True, f"Symlink already in place: {source_path} -> {target_path}"
+            
             # Check if source parent directory exists
             source_parent = os.path.dirname(source_path)
             if not os.path.exists(source_parent):
                 try:
                     os.makedirs(source_parent, exist_ok=True)
-                    logging.info(f"Created parent directory: {source_parent}")
+                    invalidate_path_cache()
+                    logger.info("Created parent directory: %s", source_parent)
                 except Exception as e:
                     return False, f"Failed to create parent directory {source_parent}: {e}"
             
             # Check if source exists and handle accordingly
-            if os.path.exists(source_path):
+            exists, is_dir, is_symlink = probe_path(source_path)
+            if exists:
                 if not force:
                     return False, f"Source path already exists: {source_path}. Use force=True to overwrite."
                 
+                # A symlink (even to a directory) is unlinked, never followed
+                if is_symlink:
+                    logger.info("Removing existing symlink: %s", source_path)
+                    os.unlink(source_path)
                 # If it's a directory, remove it
-                if os.path.isdir(source_path):
-                    logging.info(f"Removing existing directory: {source_path}")
-                    shutil.rmtree(source_path)
-                # If it's a file or symlink, remove it
+                elif is_dir:
+                    logger.info("Removing existing directory: %s", source_path)
+                    self.remove_tree(source_path)
+                # If it's a file, remove it
                 else:
-                    logging.info(f"Removing existing file or symlink: {source_path}")
+                    logger.info("Removing existing file: %s", source_path)
                     os.remove(source_path)
+                invalidate_path_cache()
             
-            # Create symbolic link
-            if os.name == 'nt':  # Windows
-                # Use mklink command through cmd
-                command = f'mklink /D "{source_path}" "{target_path}"'
-                logging.info(f"Running command: {command}")
-                
-                process = subprocess.Popen(
-                    command,
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                
-                stdout, stderr = process.communicate()
-                
-                if process.returncode != 0:
-                    return False, f"Failed to create symlink: {stderr}"
-                
-                logging.info(f"Symlink created: {source_path} -> {target_path}")
-                return True, f"Symlink created successfully: {source_path} -> {target_path}"
-            
-            else:  # Unix/Linux/MacOS
+            # Create symbolic link. On Windows os.symlink calls CreateSymbolicLinkW
+            # directly, allowing unprivileged creation in Developer Mode
+            try:
                 os.symlink(target_path, source_path, target_is_directory=True)
-                logging.info(f"Symlink created: {source_path} -> {target_path}")
-                return True, f"Symlink created successfully: {source_path} -> {target_path}"
+            except OSError as e:
+                if getattr(e, 'winerror', None) == ERROR_PRIVILEGE_NOT_HELD:
+                    return False, f"Failed to create symlink: a required privilege is not held ({e})"
+                return False, f"Failed to create symlink: {e}"
+            finally:
+                invalidate_path_cache()
+            
+            logger.info("Symlink created: %s -> %s", source_path, target_path)
+            return True, f"Symlink created successfully: {source_path} -> {target_path}"
         
         except Exception as e:
-            logging.error(f"Error creating symlink: {e}")
+            logger.error("Error creating symlink: %s", e)
             return False, f"Error creating symlink: {e}"
     
     def find_comfyui_base(self, install_path: str) -> str:
@@ -111,19 +155,38 @@ class SymlinkManager:
         Returns:
             str: Path to the ComfyUI base directory
         """
+        # One cache entry per install, whether callers pass it relative or absolute
+        install_path = os.path.abspath(install_path)
+        
+        # Reuse a previously detected layout; only found directories are cached,
+        # so a lookup made before extraction is never remembered
+        if install_path in self._base_paths:
+            return self._base_paths[install_path]
+        
         # Check for nested structure (with parent dir)
-        nested_path = os.path.join(install_path, "ComfyUI_windows_portable_nvidia", "ComfyUI_windows_portable")
-        if os.path.exists(nested_path):
+        nested_path = os.path.join(install_path, NESTED_BASE_DIR)
+        if path_exists(nested_path):
+            self._base_paths[install_path] = nested_path
             return nested_path
         
         # Check for direct structure (without parent dir)
-        direct_path = os.path.join(install_path, "ComfyUI_windows_portable")
-        if os.path.exists(direct_path):
+        direct_path = os.path.join(install_path, DIRECT_BASE_DIR)
+        if path_exists(direct_path):
+            self._base_paths[install_path] = direct_path
             return direct_path
         
         # Return nested path as default (will fail later with clear error)
         return nested_path
     
+    def invalidate_base_cache(self, install_path: str):
+        """
+        Forget the detected ComfyUI base directory, e.g. after re-extracting.
+        
+        Args:
+            install_path: Path where ComfyUI is installed
+        """
+        self._base_paths.pop(os.path.abspath(install_path), None)
+    
     def get_comfyui_models_path(self, install_path):
         """
         Get the path to the ComfyUI models directory.
@@ -135,7 +198,7 @@ class SymlinkManager:
             str: Path to the models directory
         """
         base_path = self.find_comfyui_base(install_path)
-        return os.path.join(base_path, "ComfyUI", "models")
+        return os.path.join(base_path, MODELS_DIR)
     
     def setup_model_symlinks(self, install_path, models_path):
         """
@@ -150,14 +213,14 @@ class SymlinkManager:
         """
         comfyui_models_path = self.get_comfyui_models_path(install_path)
         
-        logging.info(f"Setting up model symlink:")
-        logging.info(f"  Source: {comfyui_models_path}")
-        logging.info(f"  Target: {models_path}")
+        logger.info("Setting up model symlink:")
+        logger.info("  Source: %s", comfyui_models_path)
+        logger.info("  Target: %s", models_path)
         
         # Check if running with admin privileges on Windows
         if os.name == 'nt' and not self.is_admin():
-            logging.warning("Not running with administrator privileges")
-            logging.warning("Symbolic link creation may fail on Windows without admin rights")
+            logger.warning("Not running with administrator privileges")
+            logger.warning("Symbolic link creation may fail on Windows without admin rights")
         
         success, message = self.create_symlink(comfyui_models_path, models_path, force=True)
         
@@ -193,4 +256,4 @@ class SymlinkManager:
             str: Path to the embedded Python Scripts directory
         """
         base_path = self.find_comfyui_base(install_path)
-        return os.path.join(base_path, "python_embeded", "Scripts")
+        return os.path.join(base_path, PYTHON_SCRIPTS_DIR)